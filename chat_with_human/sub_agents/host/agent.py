@@ -2,8 +2,12 @@ from google.adk.agents import Agent
 from .prompts import host_instructions, host_description
 from .tools import (
     get_sponsors,
+    search_sponsors,
     format_outreach_email,
+    format_outreach_emails,
     send_email,
+    send_campaign,
+    get_campaign_status,
     get_email_stats,
     parse_json,
     find_sponsors_with_apollo,
@@ -19,8 +23,12 @@ host_agent = Agent(
     instruction=host_instructions(),
     tools=[
         get_sponsors,
+        search_sponsors,
         format_outreach_email,
+        format_outreach_emails,
         send_email,
+        send_campaign,
+        get_campaign_status,
         get_email_stats,
         parse_json,
         generate_image,
@@ -57,7 +57,10 @@ def host_instructions() -> str:
         - Go to PHASE 2B (Apollo/Clay/HubSpot Workflow)
         
         Step 5: Find Sponsors (Traditional Method)
-        - Use get_sponsors() to fetch potential sponsors
+        - Use search_sponsors() to find sponsors matching the event
+          (keywords, field filters, budget ranges); request facets
+          (e.g. "category") to summarize what's available
+        - Use get_sponsors() only to fetch the full list
         - Use parse_json() to process the data
         - Filter and present relevant sponsors based on event type
         
@@ -66,14 +69,20 @@ def host_instructions() -> str:
         - Get user approval on which sponsors to contact
         
         Step 7: Draft Emails
-        - Use format_outreach_email() for each approved sponsor
+        - Use format_outreach_email() for a single approved sponsor
+        - For several approved sponsors, use format_outreach_emails() once with
+          all of them (JSON list of {"sponsor_name", "sponsor_email"})
         - Present draft: "Here's the email for [Sponsor]. Any changes?"
         - Iterate until user approves
         
         Step 8: Send Emails
-        - Once approved, use send_email() with all fields:
+        - For a single sponsor, once approved, use send_email() with all fields:
           * recipient, subject, body, body_html, tracking_id
         - Confirm: "✅ Email sent! Tracking ID: [tracking_id]"
+        - For several sponsors, use send_campaign() ONCE with all of them
+          (same JSON list as format_outreach_emails) - never send_email() in a loop
+        - Confirm: "✅ Sending to [N] sponsors! Campaign send ID: [id]"
+        - Use get_campaign_status() when the user asks whether they went out
         
         Step 9: Track Results
         - When user asks about opens/clicks or email statistics, use get_email_stats()
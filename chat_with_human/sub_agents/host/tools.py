@@ -21,20 +21,57 @@ def _call_service(method: str, endpoint: str, **kwargs):
 # SPONSOR DATABASE TOOLS
 # ============================================================================
 
-def get_sponsors(category: str = "") -> str:
+def get_sponsors(category: str = "", fields: str = "") -> str:
     """
     Get list of potential sponsors from database.
     
     Args:
         category: Optional category filter (e.g., "tech", "healthcare")
+        fields: Optional comma-separated fields to return (e.g., "name,email");
+                ask only for what you need to keep the result small
     
     Returns:
         JSON string of sponsors
     """
-    params = {'category': category} if category else {}
+    params = {}
+    if category:
+        params['category'] = category
+    if fields:
+        params['fields'] = fields
     data = _call_service('GET', '/sponsors/list', params=params)
     return json.dumps(data)
 
+def search_sponsors(
+    query: str = "",
+    filters: str = "",
+    ranges: str = "",
+    facets: str = "",
+    limit: int = 10
+) -> str:
+    """
+    Search the sponsor database by keywords, exact field values and numeric
+    ranges, ranked by relevance. Prefer this over get_sponsors when looking
+    for specific sponsors (e.g. "fintech sponsors near Boston").
+    
+    Args:
+        query: Words to match anywhere in the sponsor record (e.g., "fintech boston")
+        filters: Optional semicolon-separated field:value filters
+                 (e.g., "category:tech;category:finance" - same field means any of)
+        ranges: Optional semicolon-separated field:min..max numeric filters,
+                either end optional (e.g., "budget:5000..")
+        facets: Optional comma-separated fields to count values of across all
+                matches (e.g., "category,location")
+        limit: Maximum number of sponsors to return (default 10)
+    
+    Returns:
+        JSON string with results, total match count and facet counts
+    """
+    params = [('q', query), ('facets', facets), ('limit', limit)]
+    params += [('where', f.strip()) for f in filters.split(';') if f.strip()]
+    params += [('range', r.strip()) for r in ranges.split(';') if r.strip()]
+    data = _call_service('GET', '/sponsors/search', params=params)
+    return json.dumps(data)
+
 
 # ============================================================================
 # EMAIL TOOLS
@@ -45,10 +82,11 @@ def format_outreach_email(
     sponsor_email: str,
     your_name: str,
     your_company: str,
-    event_type: str
+    event_type: str,
+    event_url: str = ""
 ) -> str:
     """
-    Format personalized outreach email with tracking.
+    Format personalized outreach email with open and click tracking.
     
     Args:
         sponsor_name: Name of the sponsor contact
@@ -56,6 +94,7 @@ def format_outreach_email(
         your_name: Your name (event organizer)
         your_company: Your company/organization name
         event_type: Type of event (e.g., "tech conference")
+        event_url: Optional link to the event page (clicks are tracked)
     
     Returns:
         JSON string with subject, body, body_html, and tracking_id
@@ -65,7 +104,42 @@ def format_outreach_email(
         'sponsor_email': sponsor_email,
         'your_name': your_name,
         'your_company': your_company,
-        'event_type': event_type
+        'event_type': event_type,
+        'event_url': event_url
+    })
+    return json.dumps(result)
+
+
+def format_outreach_emails(
+    sponsors_json: str,
+    your_name: str,
+    your_company: str,
+    event_type: str,
+    event_url: str = ""
+) -> str:
+    """
+    Format personalized outreach emails for several sponsors at once.
+    
+    Use this instead of calling format_outreach_email once per sponsor when
+    the user approves more than one sponsor.
+    
+    Args:
+        sponsors_json: JSON list of sponsors, each with "sponsor_name" and "sponsor_email"
+        your_name: Your name (event organizer)
+        your_company: Your company/organization name
+        event_type: Type of event (e.g., "tech conference")
+        event_url: Optional link to the event page (clicks are tracked)
+    
+    Returns:
+        JSON string with one entry per sponsor (recipient, subject, body,
+        body_html, tracking_id), in the same order as sponsors_json
+    """
+    result = _call_service('POST', '/email/format-batch', json={
+        'sponsors': json.loads(sponsors_json),
+        'your_name': your_name,
+        'your_company': your_company,
+        'event_type': event_type,
+        'event_url': event_url
     })
     return json.dumps(result)
 
@@ -102,6 +176,76 @@ def send_email(
     return result.get('message', 'Email sent')
 
 
+def send_campaign(
+    sponsors_json: str,
+    your_name: str,
+    your_company: str,
+    event_type: str,
+    event_url: str = "",
+    subject: str = "",
+    body: str = "",
+    campaign_id: str = "sponsor_outreach"
+) -> str:
+    """
+    Send outreach emails to many sponsors in one call (tracked, sent in the
+    background through Gmail batch requests).
+    
+    Use this instead of calling send_email once per sponsor when the user
+    approves sending to more than one sponsor.
+    
+    Args:
+        sponsors_json: JSON list of sponsors, each with "sponsor_name" and "sponsor_email"
+        your_name: Your name (event organizer)
+        your_company: Your company/organization name
+        event_type: Type of event (e.g., "tech conference")
+        event_url: Optional link to the event page (clicks are tracked)
+        subject: Optional custom subject; $sponsor_name is filled per sponsor.
+                 Leave empty for the standard subject.
+        body: Optional custom plain text body; $sponsor_name, $your_name,
+              $your_company, $event_type and $event_url are filled in.
+              Leave empty for the standard outreach email body.
+        campaign_id: Campaign name used for open/click stats
+    
+    Returns:
+        JSON string with the send ID, status and counts of queued/sent/failed emails
+    """
+    result = _call_service('POST', '/email/campaigns', json={
+        'sponsors': json.loads(sponsors_json),
+        'your_name': your_name,
+        'your_company': your_company,
+        'event_type': event_type,
+        'event_url': event_url,
+        'subject': subject,
+        'body': body,
+        'campaign_id': campaign_id
+    })
+    return json.dumps({key: result[key] for key in ('id', 'campaign_id', 'status', 'counts')})
+
+
+def get_campaign_status(send_id: str) -> str:
+    """
+    Check delivery of a campaign started with send_campaign.
+    
+    Args:
+        send_id: The "id" returned by send_campaign
+    
+    Returns:
+        JSON string with status, counts and the recipients not confirmed
+        sent: failed, unknown (may or may not have arrived - don't resend
+        without asking) or aborted (never sent, safe to resend)
+    """
+    result = _call_service('GET', f'/email/campaigns/{send_id}')
+    not_sent = [r for r in result['recipients'] if r['status'] in ('failed', 'unknown', 'aborted')]
+    return json.dumps({
+        'id': result['id'],
+        'status': result['status'],
+        'counts': result['counts'],
+        'not_sent': [
+            {'recipient': r['recipient'], 'status': r['status'], 'error': r['error']} for r in not_sent
+        ]
+    })
+
+
 def get_email_stats(tracking_id: str = "") -> str:
     """
     Get email tracking statistics.
@@ -116,8 +260,12 @@ def get_email_stats(tracking_id: str = "") -> str:
         result = _call_service('GET', f'/email/stats/{tracking_id}')
         return result.get('message', json.dumps(result))
     else:
-        # Get overall stats (not implemented yet)
-        return "Please provide a tracking_id to check specific email stats"
+        stats = _call_service('GET', '/track/stats')
+        return (
+            f"Emails sent: {stats['total_emails']}. "
+            f"Opened: {stats['total_opens']} ({stats['open_rate']}). "
+            f"Clicked: {stats['clicked_emails']} ({stats['click_rate']})"
+        )
 
 
 # ============================================================================
@@ -1,28 +1,208 @@
+import base64
+import json
 import os
-import requests
+from typing import Dict, List, Optional, Tuple
 
-def get_airtable_sponsors():
-    """Get sponsors from Airtable"""
-    
-    api_key = os.getenv('AIRTABLE_API_KEY')
-    base_id = os.getenv('AIRTABLE_BASE_ID')
-    table_id = os.getenv('AIRTABLE_TABLE_ID')
-    
-    if not all([api_key, base_id, table_id]):
+from core.airtable_client import get_airtable_client
+from core.swr_cache import SWRCache
+
+# Airtable returns at most 100 records per request, plus an `offset` to
+# continue from. Offsets stay valid for a few minutes only.
+PAGE_SIZE = 100
+
+# Sponsor lists are served from memory for CACHE_TTL seconds, then for up to
+# CACHE_MAX_STALE more while a background refresh runs
+CACHE_TTL = float(os.getenv('AIRTABLE_CACHE_TTL_SECONDS', '300'))
+CACHE_MAX_STALE = float(os.getenv('AIRTABLE_CACHE_MAX_STALE_SECONDS', '3600'))
+
+
+def airtable_configured() -> bool:
+    return all(os.getenv(name) for name in ('AIRTABLE_API_KEY', 'AIRTABLE_BASE_ID', 'AIRTABLE_TABLE_ID'))
+
+def _sponsor_table():
+    """(client, table) for the sponsors table, or None if not configured"""
+    if not airtable_configured():
         print("⚠️ Airtable credentials not configured")
-        return []
-    
-    url = f"https://api.airtable.com/v0/{base_id}/{table_id}"
-    headers = {"Authorization": f"Bearer {api_key}"}
-    
+        return None
+    return get_airtable_client(), os.getenv('AIRTABLE_TABLE_ID')
+
+
+# ============================================================================
+# QUERY PUSH-DOWN
+# ============================================================================
+
+def _formula_string(value: str) -> str:
+    escaped = value.replace('\\', '\\\\').replace("'", "\\'")
+    return f"'{escaped}'"
+
+def _formula_field(name: str) -> str:
+    if not name or '{' in name or '}' in name:
+        raise ValueError(f"Invalid Airtable field name: {name!r}")
+    return f"{{{name}}}"
+
+def build_filter_formula(filters: Dict[str, str]) -> Optional[str]:
+    """
+    filterByFormula for case-insensitive equality on each field, e.g.
+    {'category': 'Tech'} -> LOWER({category}) = 'tech'
+    """
+    clauses = [
+        f"LOWER({_formula_field(field)}) = {_formula_string(value.lower())}"
+        for field, value in sorted(filters.items())
+    ]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else f"AND({', '.join(clauses)})"
+
+def _query_params(formula: str = None, fields: Tuple[str, ...] = (),
+                  sort: Tuple[str, ...] = ()) -> List[Tuple[str, str]]:
+    """
+    Airtable list-records parameters. sort entries are field names,
+    prefixed with '-' for descending.
+    """
+    params = [("pageSize", str(PAGE_SIZE))]
+    if formula:
+        params.append(("filterByFormula", formula))
+    for field in fields:
+        params.append(("fields[]", field))
+    for i, field in enumerate(sort):
+        direction = 'desc' if field.startswith('-') else 'asc'
+        params.append((f"sort[{i}][field]", field.lstrip('-')))
+        params.append((f"sort[{i}][direction]", direction))
+    return params
+
+def iter_airtable_records(formula: str = None, fields: Tuple[str, ...] = (),
+                          sort: Tuple[str, ...] = ()):
+    """
+    Yield raw records ({id, createdTime, fields}), following Airtable's
+    offset page by page as they are consumed.
+
+    formula, fields and sort are applied by Airtable, so only matching rows
+    and the listed columns are transferred. Raises AirtableError.
+    """
+    target = _sponsor_table()
+    if target is None:
+        return
+    client, table = target
+    query = _query_params(formula, fields, sort)
+    offset = None
+
+    while True:
+        params = list(query)
+        if offset:
+            params.append(("offset", offset))
+
+        page = client.get(table, params=params)
+
+        yield from page.get("records", [])
+
+        offset = page.get("offset")
+        if not offset:
+            return
+
+def iter_airtable_sponsors(formula: str = None, fields: Tuple[str, ...] = (),
+                           sort: Tuple[str, ...] = ()):
+    """Yield every (matching) sponsor, fetching pages as they are consumed"""
+    for record in iter_airtable_records(formula, fields, sort):
+        yield record.get("fields", {})
+
+def get_airtable_sponsors():
+    """Get sponsors from Airtable (raises AirtableError)"""
+    return list(iter_airtable_sponsors())
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+def _load_sponsors(query):
+    filters, fields, sort = query
+    return list(iter_airtable_sponsors(build_filter_formula(dict(filters)), fields, sort))
+
+# Keyed by (filters, fields, sort), so each distinct query is cached on its own
+_sponsor_cache = SWRCache(
+    'airtable-sponsors',
+    _load_sponsors,
+    ttl=CACHE_TTL,
+    max_stale=CACHE_MAX_STALE
+)
+
+def sponsor_query(filters: Dict[str, str] = None, fields: List[str] = None,
+                  sort: List[str] = None):
+    """
+    Normalized, hashable query for get_cached_sponsors / iter_sponsors_from.
+
+    Raises ValueError for field names Airtable formulas can't reference.
+    """
+    # Matching is case-insensitive, so 'Tech' and 'tech' share an entry
+    filters = {field: value.lower() for field, value in (filters or {}).items() if value}
+    build_filter_formula(filters)
+    return (tuple(sorted(filters.items())), tuple(fields or ()), tuple(sort or ()))
+
+def get_cached_sponsors(query=None):
+    """
+    Sponsors matching query (see sponsor_query; default: all of them), from
+    the shared in-process cache.
+
+    The list is shared between callers - don't modify it. Raises
+    AirtableError if Airtable can't be reached and nothing usable is cached.
+    """
+    return _sponsor_cache.get(query or sponsor_query())
+
+def invalidate_sponsor_cache():
+    """Forget cached sponsors; the next lookup goes to Airtable"""
+    _sponsor_cache.invalidate()
+
+def sponsor_cache_stats():
+    return _sponsor_cache.stats()
+
+
+# ============================================================================
+# CURSOR PAGINATION
+# ============================================================================
+
+def _encode_cursor(position):
+    return base64.urlsafe_b64encode(str(position).encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        records = response.json().get("records", [])
-        sponsors = [record.get("fields", {}) for record in records]
-        
-        return sponsors
-    except Exception as e:
-        print(f"❌ Airtable error: {e}")
-        return []
\ No newline at end of file
+        position = int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if position < 0:
+        raise ValueError("Invalid cursor")
+    return position
+
+def iter_sponsors_from(sponsors: List[dict], cursor: str = None):
+    """
+    Iterate (sponsor, next_cursor) over a query result, starting at cursor.
+
+    next_cursor is a position in the list just after that sponsor; it is
+    None after the last one. Raises ValueError for a malformed cursor.
+    """
+    # Decoded eagerly so a bad cursor fails before any response is streamed
+    start = _decode_cursor(cursor) if cursor else 0
+    return _iter_sponsors(sponsors, start)
+
+def _iter_sponsors(sponsors, start):
+    for i in range(start, len(sponsors)):
+        next_cursor = _encode_cursor(i + 1) if i + 1 < len(sponsors) else None
+        yield sponsors[i], next_cursor
+
+def stream_sponsors_json(items, limit: int = None):
+    """
+    Render (sponsor, next_cursor) pairs as one JSON object, chunk by chunk:
+    {"sponsors": [...], "count": n, "next_cursor": ...}
+    """
+    yield '{"sponsors": ['
+    count = 0
+    next_cursor = None
+    for sponsor, item_cursor in items:
+        if limit is not None and count == limit:
+            break
+        yield (', ' if count else '') + json.dumps(sponsor)
+        count += 1
+        next_cursor = item_cursor
+    else:
+        # Ran out of sponsors before the limit: nothing more to page through
+        next_cursor = None
+    yield f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'
@@ -0,0 +1,163 @@
+"""
+Airtable HTTP client shared by the whole process.
+
+- One pooled keep-alive requests.Session
+- A token bucket holding all calls under Airtable's 5 requests/second per
+  base limit (AIRTABLE_RATE_LIMIT is per process: divide it by the number
+  of workers when running several)
+- Retries of 429/5xx and connection errors with exponential backoff and
+  jitter, honouring Retry-After
+- Explicit connect/read timeouts
+- Per-call latency and throttle counters for /airtable/metrics
+
+Failures are raised as AirtableError rather than turned into empty results.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.rate_limit import TokenBucket
+
+API_URL = 'https://api.airtable.com/v0'
+
+RATE_LIMIT = float(os.getenv('AIRTABLE_RATE_LIMIT', '5'))
+MAX_RETRIES = int(os.getenv('AIRTABLE_MAX_RETRIES', '4'))
+CONNECT_TIMEOUT = float(os.getenv('AIRTABLE_CONNECT_TIMEOUT', '3'))
+READ_TIMEOUT = float(os.getenv('AIRTABLE_READ_TIMEOUT', '15'))
+
+# Airtable asks clients that hit the limit to back off for 30 seconds;
+# without a Retry-After header we back off exponentially up to this
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AirtableError(Exception):
+    """Airtable request failed (after retries)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AirtableClient:
+
+    def __init__(self, api_key: str, base_id: str, rate_limit: float = RATE_LIMIT,
+                 max_retries: int = MAX_RETRIES):
+        self.base_url = f"{API_URL}/{base_id}"
+        self.max_retries = max_retries
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.limiter = TokenBucket(rate_limit)
+
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount('https://', adapter)
+
+        self._latencies = deque(maxlen=1000)
+        self._metrics_lock = threading.Lock()
+        self.counts = {
+            'calls': 0, 'errors': 0, 'retries': 0, 'throttled': 0,
+            'limiter_wait_seconds': 0.0
+        }
+
+    def request(self, method: str, table: str, params=None, json: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Call /v0/<base>/<table> and return the JSON body"""
+        url = f"{self.base_url}/{table}"
+
+        for attempt in range(self.max_retries + 1):
+            waited = self.limiter.acquire()
+            started = time.monotonic()
+            retry_after = None
+            try:
+                response = self.session.request(
+                    method, url, params=params, json=json, timeout=self.timeout
+                )
+                status = response.status_code
+            except requests.RequestException as e:
+                response, status = None, None
+                failure = f"{type(e).__name__}: {e}"
+            self._record(time.monotonic() - started, waited, status)
+
+            if response is not None:
+                if status < 400:
+                    return response.json()
+                failure = f"HTTP {status}: {response.text[:200]}"
+                if status not in _RETRY_STATUSES:
+                    break
+                retry_after = response.headers.get('Retry-After')
+
+            if attempt == self.max_retries:
+                break
+            with self._metrics_lock:
+                self.counts['retries'] += 1
+            time.sleep(self._backoff(attempt, retry_after))
+
+        with self._metrics_lock:
+            self.counts['errors'] += 1
+        raise AirtableError(f"Airtable {method} {table} failed: {failure}", status)
+
+    def get(self, table: str, params=None) -> Dict[str, Any]:
+        return self.request('GET', table, params=params)
+
+    def patch(self, table: str, json: Dict[str, Any]) -> Dict[str, Any]:
+        return self.request('PATCH', table, json=json)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                pass
+        # Full jitter: spreads out retries from concurrent callers
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def _record(self, latency: float, waited: float, status: Optional[int]):
+        with self._metrics_lock:
+            self.counts['calls'] += 1
+            self.counts['limiter_wait_seconds'] += waited
+            if status == 429:
+                self.counts['throttled'] += 1
+            self._latencies.append(latency)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self.counts)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        counts['limiter_wait_seconds'] = round(counts['limiter_wait_seconds'], 3)
+        return {
+            **counts,
+            'latency_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+            'rate_limit_per_second': self.limiter.rate,
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_airtable_client() -> Optional[AirtableClient]:
+    """The process-wide client, or None if Airtable isn't configured"""
+    global _client
+    if _client is None:
+        api_key = os.getenv('AIRTABLE_API_KEY')
+        base_id = os.getenv('AIRTABLE_BASE_ID')
+        if not api_key or not base_id:
+            return None
+        with _client_lock:
+            if _client is None:
+                _client = AirtableClient(api_key, base_id)
+    return _client
@@ -0,0 +1,237 @@
+"""
+Write-back of outreach and sponsorship status to the Airtable sponsor table.
+
+Status changes (email sent, first open, payment) are queued in memory and
+flushed every WRITEBACK_INTERVAL seconds. Each flush merges all updates for
+the same sponsor into one, finds the sponsors' record IDs by email (from the
+local mirror, else one Airtable lookup per 50 emails) and sends them as
+batch PATCH calls of 10 records - Airtable's maximum per request. Statuses
+only move forward: contacted < opened < sponsor. Before writing anything
+below sponsor, the current status is read from Airtable.
+
+Updates Airtable rejects outright (e.g. a column that doesn't exist) are
+dropped and counted in writeback_status(); other failures are retried on
+the next flush.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List
+
+from core.airtable import airtable_configured, build_filter_formula
+from core.airtable_client import AirtableError, get_airtable_client
+from core.sponsor_mirror import find_records_by_field
+from core.tracking import on_first_open
+from core.write_behind import WriteBehindBuffer
+
+WRITEBACK_ENABLED = os.getenv('AIRTABLE_WRITEBACK', 'true').lower() in ('1', 'true', 'yes')
+WRITEBACK_INTERVAL = float(os.getenv('AIRTABLE_WRITEBACK_INTERVAL_SECONDS', '10'))
+
+# Column names in the sponsor table; set one to '' to stop writing it
+EMAIL_FIELD = os.getenv('AIRTABLE_EMAIL_FIELD', 'email')
+STATUS_FIELD = os.getenv('AIRTABLE_STATUS_FIELD', 'Outreach Status')
+CONTACTED_AT_FIELD = os.getenv('AIRTABLE_CONTACTED_AT_FIELD', 'Last Contacted')
+OPENED_AT_FIELD = os.getenv('AIRTABLE_OPENED_AT_FIELD', 'Opened At')
+PAID_AT_FIELD = os.getenv('AIRTABLE_PAID_AT_FIELD', 'Paid At')
+TIER_FIELD = os.getenv('AIRTABLE_TIER_FIELD', 'Sponsorship Tier')
+AMOUNT_FIELD = os.getenv('AIRTABLE_AMOUNT_FIELD', 'Sponsorship Amount')
+
+# status -> (rank, value written to STATUS_FIELD, timestamp field)
+STATUSES = {
+    'contacted': (1, os.getenv('AIRTABLE_STATUS_CONTACTED', 'Contacted'), CONTACTED_AT_FIELD),
+    'opened': (2, os.getenv('AIRTABLE_STATUS_OPENED', 'Opened'), OPENED_AT_FIELD),
+    'sponsor': (3, os.getenv('AIRTABLE_STATUS_SPONSOR', 'Sponsor'), PAID_AT_FIELD),
+}
+_RANK_BY_VALUE = {value: rank for rank, value, _ in STATUSES.values()}
+
+PATCH_BATCH = 10        # Airtable's limit per update request
+LOOKUP_BATCH = 50       # emails per filterByFormula lookup
+
+writeback_stats = {
+    'queued': 0, 'patched_records': 0, 'patch_calls': 0, 'lookups': 0, 'unmatched': 0,
+    'rejected': 0, 'last_rejection': None
+}
+
+# email -> record ID, for sponsors already resolved (bounded)
+_record_ids = OrderedDict()
+_record_ids_lock = threading.Lock()
+_RECORD_ID_CACHE_SIZE = 10_000
+
+
+def _field(fields: Dict[str, Any], name: str, value):
+    if name:
+        fields[name] = value
+
+def _merge(items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """email -> {'rank', 'fields'}: one update per sponsor, highest status wins"""
+    merged = {}
+    for item in items:
+        rank, status_value, at_field = STATUSES[item['status']]
+        entry = merged.setdefault(item['email'], {'rank': 0, 'fields': {}})
+        _field(entry['fields'], at_field, item['at'])
+        entry['fields'].update(item.get('fields') or {})
+        if rank >= entry['rank']:
+            entry['rank'] = rank
+            _field(entry['fields'], STATUS_FIELD, status_value)
+    return merged
+
+def _lookup(emails: List[str]) -> Dict[str, Dict[str, Any]]:
+    """email -> {'id', 'status'} straight from Airtable, one call per LOOKUP_BATCH emails"""
+    found = {}
+    client = get_airtable_client()
+    table = os.getenv('AIRTABLE_TABLE_ID')
+    for i in range(0, len(emails), LOOKUP_BATCH):
+        chunk = emails[i:i + LOOKUP_BATCH]
+        clauses = [build_filter_formula({EMAIL_FIELD: email}) for email in chunk]
+        params = [('filterByFormula', f"OR({', '.join(clauses)})"), ('fields[]', EMAIL_FIELD)]
+        if STATUS_FIELD:
+            params.append(('fields[]', STATUS_FIELD))
+        offset = None
+        while True:
+            page = client.get(table, params=params + ([('offset', offset)] if offset else []))
+            writeback_stats['lookups'] += 1
+            for record in page.get('records', []):
+                email = str(record['fields'].get(EMAIL_FIELD, '')).lower()
+                found[email] = {'id': record['id'], 'status': record['fields'].get(STATUS_FIELD)}
+            offset = page.get('offset')
+            if not offset:
+                break
+    return found
+
+def _resolve(emails: List[str], need_status: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    email -> {'id', 'status'} for sponsors in the table.
+
+    Emails in need_status get their current status from Airtable itself:
+    the mirror can lag a write made by another worker, and the record ID
+    cache knows no status at all. For the others, status may be None.
+    """
+    need_status = set(need_status)
+    found = {}
+    ids_only = [email for email in emails if email not in need_status]
+    for email, record in find_records_by_field(EMAIL_FIELD, ids_only).items():
+        found[email] = {'id': record['id'], 'status': record['fields'].get(STATUS_FIELD)}
+
+    with _record_ids_lock:
+        for email in ids_only:
+            if email not in found and email in _record_ids:
+                found[email] = {'id': _record_ids[email], 'status': None}
+
+    found.update(_lookup([email for email in emails if email not in found]))
+
+    with _record_ids_lock:
+        for email, record in found.items():
+            _record_ids[email] = record['id']
+            _record_ids.move_to_end(email)
+        while len(_record_ids) > _RECORD_ID_CACHE_SIZE:
+            _record_ids.popitem(last=False)
+    return found
+
+def _rejected(error: AirtableError, count: int):
+    """
+    Drop updates Airtable refused outright (4xx other than 429, e.g. an
+    unknown field name): sending them again can't succeed and would only use
+    up the rate limit sponsor reads share. Anything else is raised, so the
+    buffer keeps the batch for the next tick.
+    """
+    status = error.status_code
+    if status is None or status == 429 or not 400 <= status < 500:
+        raise error
+    writeback_stats['rejected'] += count
+    writeback_stats['last_rejection'] = str(error)[:500]
+    print(f"❌ Airtable write-back: dropped {count} update(s): {error}")
+
+def flush_updates(items: List[Dict[str, Any]]):
+    """Merge queued updates and PATCH them to Airtable in batches of 10"""
+    merged = _merge(items)
+    # Writing the highest status can't move a sponsor back; anything lower
+    # is checked against the status currently in Airtable
+    top_rank = max(rank for rank, _, _ in STATUSES.values())
+    need_status = [email for email, entry in merged.items()
+                   if STATUS_FIELD and entry['rank'] < top_rank]
+    try:
+        records = _resolve(list(merged), need_status)
+    except AirtableError as e:
+        _rejected(e, len(merged))
+        return
+
+    updates = []
+    for email, entry in merged.items():
+        record = records.get(email)
+        if record is None:
+            writeback_stats['unmatched'] += 1
+            continue
+        fields = dict(entry['fields'])
+        # Never move a sponsor back (e.g. a late open after payment)
+        if _RANK_BY_VALUE.get(record['status'], 0) > entry['rank']:
+            fields.pop(STATUS_FIELD, None)
+        if fields:
+            updates.append({'id': record['id'], 'fields': fields})
+
+    client = get_airtable_client()
+    table = os.getenv('AIRTABLE_TABLE_ID')
+    patched_before = writeback_stats['patched_records']
+    for i in range(0, len(updates), PATCH_BATCH):
+        chunk = updates[i:i + PATCH_BATCH]
+        try:
+            client.patch(table, {'records': chunk, 'typecast': True})
+        except AirtableError as e:
+            _rejected(e, len(chunk))
+            continue
+        writeback_stats['patch_calls'] += 1
+        writeback_stats['patched_records'] += len(chunk)
+
+    patched = writeback_stats['patched_records'] - patched_before
+    if patched:
+        print(f"📤 Airtable write-back: {patched} sponsor(s) updated")
+
+_buffer = WriteBehindBuffer(
+    'airtable-writeback', flush_updates, max_batch=1000, flush_interval=WRITEBACK_INTERVAL
+)
+
+
+def enqueue_status(email: str, status: str, fields: Dict[str, Any] = None):
+    """
+    Queue a status update ('contacted', 'opened' or 'sponsor') for the
+    sponsor with this email, plus any extra fields. Returns immediately.
+    """
+    if not WRITEBACK_ENABLED or not email or not airtable_configured():
+        return
+    _buffer.put({
+        'email': email.strip().lower(),
+        'status': status,
+        'at': datetime.now().astimezone().isoformat(),
+        'fields': fields or {}
+    })
+    writeback_stats['queued'] += 1
+
+def enqueue_sponsorship(email: str, tier: str = None, amount: str = None):
+    """Queue the 'sponsor' status for a completed payment"""
+    fields = {}
+    _field(fields, TIER_FIELD, tier)
+    _field(fields, AMOUNT_FIELD, amount)
+    enqueue_status(email, 'sponsor', fields)
+
+def _on_first_open(first_opens):
+    for opened in first_opens:
+        enqueue_status(opened['recipient'], 'opened')
+
+on_first_open(_on_first_open)
+
+def start_writeback():
+    if WRITEBACK_ENABLED and airtable_configured():
+        _buffer.start()
+
+def stop_writeback():
+    """Flush pending updates (call on shutdown)"""
+    _buffer.stop()
+
+def writeback_status() -> Dict[str, Any]:
+    return {
+        'enabled': WRITEBACK_ENABLED and airtable_configured(),
+        'pending': _buffer.pending(),
+        'dropped': _buffer.dropped,
+        **writeback_stats
+    }
@@ -0,0 +1,185 @@
+"""
+Bulk campaign sends through Gmail batch requests.
+
+A campaign's messages are split into batches of BATCH_SIZE, each sent as
+one Gmail batch HTTP request by a bounded pool of CAMPAIGN_WORKERS threads.
+Gmail meters sends per user (a send costs 100 of the 250 quota units per
+second), so a token bucket holds the pool under SEND_RATE messages per
+second; messages Gmail answers with a rate limit or 5xx error are retried
+in a later batch. If a batch request itself fails midway (timeout, dropped
+connection) its messages are marked 'unknown' rather than resent, since
+Gmail may already have delivered them.
+
+Each batch claims its recipients (queued -> sending) before sending, and
+only claimed recipients are sent or have their outcome recorded, so a
+recipient marked 'aborted' is never sent afterwards. On shutdown, batches
+not yet claimed are marked 'aborted'. The worker holding a send's batches
+refreshes its heartbeat; once that is STALL_MINUTES old (the worker was
+killed), the send's queued recipients are marked 'aborted' and the ones
+being sent 'unknown'.
+
+Per-recipient status is stored in the tracking database, so any worker can
+answer GET /email/campaigns/<id>.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from google.auth.exceptions import GoogleAuthError
+from googleapiclient.errors import HttpError
+
+from core.airtable_writeback import enqueue_status
+from core.gmail import send_gmail_batch
+from core.rate_limit import TokenBucket
+from core.tracking import (
+    abort_deliveries, abort_stalled_deliveries, claim_deliveries, create_campaign_send,
+    get_campaign_send, record_deliveries, touch_campaign_sends
+)
+
+CAMPAIGN_WORKERS = int(os.getenv('GMAIL_CAMPAIGN_WORKERS', '4'))
+SEND_RATE = float(os.getenv('GMAIL_SEND_RATE', '2'))
+BATCH_SIZE = min(int(os.getenv('GMAIL_BATCH_SIZE', '25')), 100)   # Gmail allows 100 per batch
+MAX_RETRIES = int(os.getenv('GMAIL_MAX_RETRIES', '3'))
+MAX_RECIPIENTS = int(os.getenv('GMAIL_CAMPAIGN_MAX_RECIPIENTS', '1000'))
+STALL_MINUTES = float(os.getenv('GMAIL_CAMPAIGN_STALL_MINUTES', '5'))
+HEARTBEAT_SECONDS = 30
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Batch-level responses that mean Gmail processed none of the batch
+_BATCH_REFUSED_STATUSES = {429, 503}
+
+_SHUTDOWN_ERROR = "Server shut down before sending"
+
+_executor = ThreadPoolExecutor(max_workers=CAMPAIGN_WORKERS, thread_name_prefix='gmail-campaign')
+_limiter = TokenBucket(SEND_RATE, capacity=BATCH_SIZE)
+_futures = {}          # future -> (send_id, batch)
+_stopping = threading.Event()
+
+
+def _retryable(result: Dict) -> bool:
+    """Only per-message throttling and server errors: Gmail answered, and didn't send it"""
+    status = result.get('status')
+    # Gmail reports per-user rate limits as 403 rateLimitExceeded
+    return status in _RETRY_STATUSES or (
+        status == 403 and 'ratelimitexceeded' in result['error'].lower()
+    )
+
+def _record_unknown(send_id: str, pending, error: Exception):
+    message = f"Delivery unknown: {type(error).__name__}: {error}"[:500]
+    record_deliveries(send_id, [(position, 'unknown', None, message) for position, _ in pending])
+
+def _record_aborted(send_id: str, pending):
+    """Claimed recipients this worker is giving up on"""
+    record_deliveries(send_id, [(position, 'aborted', None, _SHUTDOWN_ERROR) for position, _ in pending])
+
+def _send_batch(send_id: str, batch):
+    """Send [(position, message), ...], retrying throttled messages, and record the outcome"""
+    positions = [position for position, _ in batch]
+    if _stopping.is_set():
+        abort_deliveries(send_id, positions, _SHUTDOWN_ERROR)
+        return
+    # Another worker may have reported the send stalled and aborted these
+    claimed = set(claim_deliveries(send_id, positions))
+    pending = [(position, message) for position, message in batch if position in claimed]
+    if not pending:
+        return
+
+    for attempt in range(MAX_RETRIES + 1):
+        if _stopping.is_set():
+            _record_aborted(send_id, pending)
+            return
+        for _ in pending:
+            _limiter.acquire()
+        try:
+            results = send_gmail_batch([message for _, message in pending])
+        except GoogleAuthError as e:
+            # Failed getting a token: nothing was sent
+            results = [{'error': f"{type(e).__name__}: {e}", 'status': None}] * len(pending)
+        except HttpError as e:
+            # The batch as a whole was refused (throttled, unavailable or bad)
+            # and nothing in it was sent; other 5xx (e.g. a gateway timeout)
+            # leave the outcome open
+            status = e.resp.status
+            if status not in _BATCH_REFUSED_STATUSES and status >= 500:
+                _record_unknown(send_id, pending, e)
+                return
+            results = [{'error': str(e), 'status': status}] * len(pending)
+        except Exception as e:
+            # Timeout or dropped connection: Gmail may have sent some or all of
+            # these, so they are neither retried nor reported as failed
+            _record_unknown(send_id, pending, e)
+            return
+
+        outcomes, retry = [], []
+        for (position, message), result in zip(pending, results):
+            if 'id' in result:
+                outcomes.append((position, 'sent', result['id'], None))
+                enqueue_status(message['recipient'], 'contacted')
+            elif attempt < MAX_RETRIES and _retryable(result):
+                retry.append((position, message))
+            else:
+                outcomes.append((position, 'failed', None, result['error'][:500]))
+        record_deliveries(send_id, outcomes)
+
+        if not retry:
+            return
+        pending = retry
+        _stopping.wait(random.uniform(0, min(30.0, 2 ** attempt)))
+
+def _send_batch_logged(send_id: str, batch):
+    try:
+        _send_batch(send_id, batch)
+    except Exception as e:
+        # Claimed recipients become 'unknown' once the send's heartbeat goes stale
+        print(f"❌ Campaign {send_id} batch failed: {e}")
+
+def start_campaign(campaign_id: str, messages: List[Dict[str, str]], tracking_ids: List[str]) -> str:
+    """
+    Queue messages ({recipient, subject, body, body_html}) for sending and
+    return the send's ID. Returns before anything is sent.
+    """
+    send_id = uuid.uuid4().hex[:16]
+    create_campaign_send(send_id, campaign_id, [m['recipient'] for m in messages], tracking_ids)
+
+    indexed = list(enumerate(messages))
+    for i in range(0, len(indexed), BATCH_SIZE):
+        batch = indexed[i:i + BATCH_SIZE]
+        future = _executor.submit(_send_batch_logged, send_id, batch)
+        _futures[future] = (send_id, batch)
+        future.add_done_callback(lambda f: _futures.pop(f, None))
+
+    print(f"📨 Campaign {send_id}: {len(messages)} email(s) queued")
+    return send_id
+
+def campaign_send_status(send_id: str):
+    """get_campaign_send(), first settling the send if its worker went away"""
+    stalled_before = datetime.now() - timedelta(minutes=STALL_MINUTES)
+    if abort_stalled_deliveries(send_id, stalled_before):
+        print(f"⚠️ Campaign {send_id} stalled; unsent recipients marked aborted/unknown")
+    return get_campaign_send(send_id)
+
+async def heartbeat_loop(interval_seconds: float = HEARTBEAT_SECONDS):
+    """Keep sends this worker still has batches of from being reported stalled (started from the app lifespan)"""
+    while True:
+        try:
+            send_ids = {send_id for send_id, _ in list(_futures.values())}
+            await asyncio.to_thread(touch_campaign_sends, sorted(send_ids))
+        except Exception as e:
+            print(f"❌ Campaign heartbeat failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+def stop_campaigns():
+    """Abort batches that haven't been sent (call on shutdown)"""
+    _stopping.set()
+    for future, (send_id, batch) in list(_futures.items()):
+        if future.cancel():
+            try:
+                abort_deliveries(send_id, [position for position, _ in batch], _SHUTDOWN_ERROR)
+            except Exception as e:
+                print(f"❌ Campaign {send_id}: could not mark batch aborted: {e}")
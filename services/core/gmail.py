@@ -1,13 +1,35 @@
+"""
+Gmail API client shared by the whole process.
+
+The service object is built once (from the discovery document bundled with
+google-api-python-client, so nothing is fetched) and its credentials are
+refreshed in place, under a lock, shortly before they expire. httplib2
+connections aren't thread-safe, so each thread executes requests on its own
+authorized connection, kept open between sends.
+"""
+
 import os
 import base64
+import threading
+from typing import Any, Dict, List
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import httplib2
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 
-def get_gmail_service():
-    """Get Gmail API service"""
-    
+GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.send']
+GMAIL_TIMEOUT = float(os.getenv('GMAIL_TIMEOUT_SECONDS', '30'))
+
+_service = None
+_creds = None
+_service_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_local = threading.local()
+
+def _find_token_path() -> str:
     # Try local path first, then cloud path
     token_paths = [
         './secrets/gmail_token.json',
@@ -16,28 +38,63 @@ def get_gmail_service():
         os.getenv('GMAIL_TOKEN_PATH', './secrets/gmail_token.json')
     ]
     
-    token_path = None
     for path in token_paths:
         if os.path.exists(path):
-            token_path = path
-            break
-    
-    if not token_path:
-        raise FileNotFoundError(f"Gmail token not found. Tried: {token_paths}")
+            return path
     
-    print(f"✅ Using Gmail token from: {token_path}")
-    
-    creds = Credentials.from_authorized_user_file(
-        token_path,
-        ['https://www.googleapis.com/auth/gmail.send']
-    )
-    
-    return build('gmail', 'v1', credentials=creds)
+    raise FileNotFoundError(f"Gmail token not found. Tried: {token_paths}")
 
-def send_gmail_with_tracking(recipient: str, subject: str, body: str, body_html: str = ""):
-    """Send email via Gmail API"""
+def get_gmail_service():
+    """Get the Gmail API service (built on first use)"""
+    global _service, _creds
     
-    service = get_gmail_service()
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                token_path = _find_token_path()
+                print(f"✅ Using Gmail token from: {token_path}")
+                
+                _creds = Credentials.from_authorized_user_file(token_path, GMAIL_SCOPES)
+                _service = build(
+                    'gmail', 'v1',
+                    credentials=_creds,
+                    static_discovery=True,
+                    cache_discovery=False
+                )
+    return _service
+
+def init_gmail():
+    """Build the Gmail service at startup; sending is unavailable until a token exists"""
+    try:
+        get_gmail_service()
+    except Exception as e:
+        print(f"⚠️ Gmail not initialized: {e}")
+
+def _fresh_credentials() -> Credentials:
+    # One thread refreshes; the others wait and then reuse the new token
+    if not _creds.valid:
+        with _refresh_lock:
+            if not _creds.valid:
+                _creds.refresh(Request())
+                print("🔄 Gmail access token refreshed")
+    return _creds
+
+def _thread_http() -> AuthorizedHttp:
+    """This thread's authorized connection to Gmail"""
+    http = getattr(_local, 'http', None)
+    if http is None:
+        http = AuthorizedHttp(_creds, http=httplib2.Http(timeout=GMAIL_TIMEOUT))
+        _local.http = http
+    return http
+
+def execute(request):
+    """Run a Gmail API request (or batch) from any thread"""
+    get_gmail_service()
+    _fresh_credentials()
+    return request.execute(http=_thread_http())
+
+def _raw_message(recipient: str, subject: str, body: str, body_html: str = "") -> str:
+    """Base64url-encoded MIME message, as the Gmail API expects it"""
     
     if body_html:
         # Multipart email with HTML
@@ -58,11 +115,46 @@ def send_gmail_with_tracking(recipient: str, subject: str, body: str, body_html:
         message['from'] = 'me'
         message['subject'] = subject
     
-    raw = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+    return base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+
+def send_gmail_with_tracking(recipient: str, subject: str, body: str, body_html: str = ""):
+    """Send email via Gmail API"""
+    
+    service = get_gmail_service()
+    raw = _raw_message(recipient, subject, body, body_html)
     
-    sent = service.users().messages().send(
+    sent = execute(service.users().messages().send(
         userId='me',
         body={'raw': raw}
-    ).execute()
+    ))
+    
+    return sent['id']
+
+def send_gmail_batch(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Send up to 100 messages ({recipient, subject, body, body_html}) in one
+    batch HTTP request.
+    
+    Returns one result per message, in order: {'id': message_id} or
+    {'error': str, 'status': HTTP status or None}. Raises if the batch
+    request itself fails.
+    """
+    service = get_gmail_service()
+    results = [None] * len(messages)
+    
+    def on_response(request_id, response, exception):
+        position = int(request_id)
+        if exception is None:
+            results[position] = {'id': response['id']}
+        else:
+            status = getattr(getattr(exception, 'resp', None), 'status', None)
+            results[position] = {'error': str(exception), 'status': status}
     
-    return sent['id']
\ No newline at end of file
+    batch = service.new_batch_http_request(callback=on_response)
+    for position, message in enumerate(messages):
+        raw = _raw_message(message['recipient'], message['subject'], message['body'],
+                           message.get('body_html', ''))
+        batch.add(service.users().messages().send(userId='me', body={'raw': raw}),
+                  request_id=str(position))
+    execute(batch)
+    return results
@@ -0,0 +1,166 @@
+"""
+HubSpot OAuth access tokens, kept valid ahead of expiry.
+
+HubSpot access tokens live for 30 minutes. refresh_loop() (started from the
+app lifespan) refreshes every stored token well before it expires, and
+get_valid_hubspot_token() refreshes just in time when a request finds one
+that is about to. Refreshes for a user are single-flight, across threads and
+worker processes (flock, like the token file): concurrent callers wait for
+the one in progress and then use its result. HubSpot rotates refresh tokens,
+so two refreshes racing would leave one worker holding a revoked one.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any
+
+import requests
+
+from core.token_store import TOKEN_FILE, get_user_token_data, store_user_token, list_service_users
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines - thread lock only
+    fcntl = None
+
+HUBSPOT_CLIENT_ID = os.getenv('HUBSPOT_CLIENT_ID') or os.getenv('HUBSPOT_CLIENT_SECRET')  # Try both env names
+HUBSPOT_CLIENT_SECRET = os.getenv('HUBSPOT_CLIENT_SECRET')
+HUBSPOT_TOKEN_URL = 'https://api.hubapi.com/oauth/v1/token'
+
+# Request-time refresh when less than this is left
+REFRESH_MARGIN_SECONDS = int(os.getenv('HUBSPOT_REFRESH_MARGIN_SECONDS', '120'))
+# Background refresh when less than this is left, checked every interval
+REFRESH_AHEAD_SECONDS = int(os.getenv('HUBSPOT_REFRESH_AHEAD_SECONDS', '600'))
+REFRESH_INTERVAL_SECONDS = int(os.getenv('HUBSPOT_REFRESH_INTERVAL_SECONDS', '300'))
+
+# Per-user refresh lock files live next to the token file
+REFRESH_LOCK_DIR = os.path.dirname(TOKEN_FILE)
+
+_user_locks = {}
+_user_locks_guard = threading.Lock()
+
+
+def expires_at_from(expires_in) -> Optional[str]:
+    """Absolute ISO (UTC) expiry for an expires_in seconds value"""
+    if expires_in is None:
+        return None
+    return (datetime.now(timezone.utc) + timedelta(seconds=int(expires_in))).isoformat()
+
+def _expiry(token_data: Dict[str, Any]) -> Optional[datetime]:
+    expires_at = token_data.get('expires_at')
+    if expires_at is None:
+        return None
+
+    # Tokens stored before expires_at was absolute hold expires_in seconds
+    if isinstance(expires_at, int) or str(expires_at).isdigit():
+        connected_at = datetime.fromisoformat(token_data['connected_at']).astimezone(timezone.utc)
+        return connected_at + timedelta(seconds=int(expires_at))
+
+    expiry = datetime.fromisoformat(expires_at)
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    return expiry
+
+def _seconds_left(token_data: Dict[str, Any]) -> Optional[float]:
+    expiry = _expiry(token_data)
+    if expiry is None:
+        return None
+    return (expiry - datetime.now(timezone.utc)).total_seconds()
+
+def _user_lock(user_id: str) -> threading.Lock:
+    with _user_locks_guard:
+        return _user_locks.setdefault(user_id, threading.Lock())
+
+@contextmanager
+def _refresh_lock(user_id: str):
+    """Held while refreshing user_id's token: thread lock, then flock across workers"""
+    with _user_lock(user_id):
+        if fcntl is None:
+            yield
+            return
+        name = hashlib.sha256(user_id.encode()).hexdigest()[:16]
+        os.makedirs(REFRESH_LOCK_DIR, exist_ok=True)
+        with open(os.path.join(REFRESH_LOCK_DIR, f'.hubspot_refresh_{name}.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def refresh_hubspot_token(user_id: str, token_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Exchange the refresh token for a new access token and store it"""
+    response = requests.post(
+        HUBSPOT_TOKEN_URL,
+        data={
+            'grant_type': 'refresh_token',
+            'refresh_token': token_data['refresh_token'],
+            'client_id': HUBSPOT_CLIENT_ID,
+            'client_secret': HUBSPOT_CLIENT_SECRET
+        },
+        timeout=15
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"HubSpot token refresh failed: {response.text}")
+
+    refreshed = response.json()
+    additional_data = token_data.get('additional_data') or {}
+    store_user_token(
+        user_id=user_id,
+        service_name='hubspot',
+        access_token=refreshed.get('access_token'),
+        refresh_token=refreshed.get('refresh_token') or token_data['refresh_token'],
+        expires_at=expires_at_from(refreshed.get('expires_in')),
+        additional_data={**additional_data, 'token_type': refreshed.get('token_type')}
+    )
+    print(f"🔄 Refreshed HubSpot token for {user_id}")
+    return get_user_token_data(user_id, 'hubspot')
+
+def get_valid_hubspot_token(user_id: str, margin_seconds: int = REFRESH_MARGIN_SECONDS) -> Optional[str]:
+    """
+    HubSpot access token for user_id with at least margin_seconds left.
+
+    Refreshes if needed. Returns None if HubSpot isn't connected, or the
+    token has expired and can't be refreshed.
+    """
+    token_data = get_user_token_data(user_id, 'hubspot')
+    if not token_data:
+        return None
+
+    left = _seconds_left(token_data)
+    if left is None or left > margin_seconds:
+        return token_data.get('access_token')
+
+    with _refresh_lock(user_id):
+        # Another caller (or worker) may have refreshed while we waited for the lock
+        token_data = get_user_token_data(user_id, 'hubspot')
+        if not token_data:
+            return None
+        left = _seconds_left(token_data)
+        if left is None or left > margin_seconds:
+            return token_data.get('access_token')
+
+        if not token_data.get('refresh_token'):
+            print(f"⚠️ HubSpot token for {user_id} expires without a refresh token")
+            return token_data.get('access_token') if left > 0 else None
+
+        try:
+            return refresh_hubspot_token(user_id, token_data).get('access_token')
+        except Exception as e:
+            print(f"❌ {e}")
+            return token_data.get('access_token') if left > 0 else None
+
+
+async def refresh_loop(interval_seconds: int = REFRESH_INTERVAL_SECONDS):
+    """Refresh stored HubSpot tokens ahead of expiry (started from the app lifespan)"""
+    while True:
+        try:
+            for user_id in await asyncio.to_thread(list_service_users, 'hubspot'):
+                await asyncio.to_thread(get_valid_hubspot_token, user_id, REFRESH_AHEAD_SECONDS)
+        except Exception as e:
+            print(f"❌ HubSpot token refresh failed: {e}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,322 @@
+"""
+Local SQLite mirror of the Airtable sponsor table.
+
+A background job keeps the mirror current: a delta sync every SYNC_INTERVAL
+pulls only records modified since the previous sync (via
+LAST_MODIFIED_TIME()), and a full sync every RECONCILE_INTERVAL also drops
+records deleted in Airtable. Once the first full sync has completed,
+sponsor queries are answered from the mirror and Airtable is out of the
+request path; until then they go through the Airtable cache.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from core.airtable import airtable_configured, get_cached_sponsors, iter_airtable_records
+
+MIRROR_DB = os.getenv('AIRTABLE_MIRROR_DB') or (
+    '/tmp/sponsor_mirror.db' if os.getenv('K_SERVICE') else 'sponsor_mirror.db'
+)
+SYNC_INTERVAL = float(os.getenv('AIRTABLE_SYNC_INTERVAL_SECONDS', '60'))
+RECONCILE_INTERVAL = float(os.getenv('AIRTABLE_RECONCILE_INTERVAL_SECONDS', '3600'))
+
+# Fields with an expression index for filtering
+INDEXED_FIELDS = [
+    f.strip() for f in os.getenv('AIRTABLE_MIRROR_INDEXED_FIELDS', 'category,email').split(',') if f.strip()
+]
+
+# Delta windows overlap by this much to absorb clock skew with Airtable;
+# re-applying a record is harmless
+SYNC_OVERLAP = timedelta(seconds=60)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sponsors (
+    record_id    TEXT PRIMARY KEY,
+    created_time TEXT NOT NULL,
+    fields       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sponsors_created ON sponsors (created_time);
+
+-- sync kind ('delta' / 'full') -> when it last started and completed
+CREATE TABLE IF NOT EXISTS sync_state (
+    kind         TEXT PRIMARY KEY,
+    started_at   TEXT,
+    completed_at TEXT
+);
+
+-- Bumped by every sync that changes the mirrored data
+CREATE TABLE IF NOT EXISTS data_version (
+    id      INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+sync_stats = {'delta_syncs': 0, 'full_syncs': 0, 'records_upserted': 0, 'records_deleted': 0}
+
+
+# ============================================================================
+# CONNECTION & SCHEMA
+# ============================================================================
+
+def _json_path(field: str) -> str:
+    # Field names end up in SQL text (so expression indexes match), never values
+    if not field or any(c in field for c in '{}"\''):
+        raise ValueError(f"Invalid field name: {field!r}")
+    return f"'$.\"{field}\"'"
+
+def _field_expr(field: str) -> str:
+    """SQL for a field's value; identical text lets SQLite use the expression index"""
+    return f"json_extract(fields, {_json_path(field)})"
+
+def _get_conn():
+    """Per-thread autocommit connection; the schema is created on first use"""
+    global _initialized
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(MIRROR_DB, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        _local.conn = conn
+
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.executescript(_SCHEMA)
+                for field in INDEXED_FIELDS:
+                    index = 'idx_sponsors_f_' + ''.join(c if c.isalnum() else '_' for c in field)
+                    conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS {index} ON sponsors (LOWER({_field_expr(field)}))"
+                    )
+                _initialized = True
+    return conn
+
+@contextmanager
+def _write_transaction(conn):
+    """BEGIN IMMEDIATE ... COMMIT (rolled back on error)"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+# ============================================================================
+# SYNC
+# ============================================================================
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _iso(ts: datetime) -> str:
+    return ts.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+def _claim_sync(conn, kind: str, interval: float) -> bool:
+    """
+    Record that a `kind` sync is starting, unless one started less than
+    interval seconds ago (e.g. in another worker process)
+    """
+    now = _now()
+    with _write_transaction(conn):
+        row = conn.execute('SELECT started_at FROM sync_state WHERE kind = ?', (kind,)).fetchone()
+        if row and row['started_at']:
+            started = datetime.fromisoformat(row['started_at'])
+            if (now - started).total_seconds() < interval * 0.9:
+                return False
+        conn.execute(
+            'INSERT INTO sync_state (kind, started_at) VALUES (?, ?) '
+            'ON CONFLICT(kind) DO UPDATE SET started_at = excluded.started_at',
+            (kind, now.isoformat())
+        )
+    return True
+
+def _complete_sync(conn, kind: str, started: datetime):
+    conn.execute('UPDATE sync_state SET completed_at = ? WHERE kind = ?', (started.isoformat(), kind))
+
+def _upsert(conn, records) -> int:
+    """Insert or update records; returns how many rows actually changed"""
+    before = conn.total_changes
+    conn.executemany(
+        'INSERT INTO sponsors (record_id, created_time, fields) VALUES (?, ?, ?) '
+        'ON CONFLICT(record_id) DO UPDATE SET fields = excluded.fields '
+        'WHERE fields IS NOT excluded.fields',
+        [(r['id'], r.get('createdTime', ''), json.dumps(r.get('fields', {}), sort_keys=True))
+         for r in records]
+    )
+    return conn.total_changes - before
+
+def _bump_version(conn):
+    conn.execute(
+        'INSERT INTO data_version (id, version) VALUES (1, 1) '
+        'ON CONFLICT(id) DO UPDATE SET version = version + 1'
+    )
+
+def delta_sync(force: bool = False) -> int:
+    """
+    Pull records modified since the last sync (full or delta).
+
+    Returns the number of records that changed, or -1 if skipped (no full
+    sync yet, or another worker synced recently).
+    """
+    conn = _get_conn()
+    if not mirror_ready():
+        return -1
+    if not _claim_sync(conn, 'delta', 0 if force else SYNC_INTERVAL):
+        return -1
+
+    started = _now()
+    last = conn.execute(
+        'SELECT MAX(completed_at) FROM sync_state WHERE completed_at IS NOT NULL'
+    ).fetchone()[0]
+    since = datetime.fromisoformat(last) - SYNC_OVERLAP
+    records = list(iter_airtable_records(f"IS_AFTER(LAST_MODIFIED_TIME(), '{_iso(since)}')"))
+
+    with _write_transaction(conn):
+        applied = _upsert(conn, records)
+        if applied:
+            _bump_version(conn)
+        _complete_sync(conn, 'delta', started)
+
+    sync_stats['delta_syncs'] += 1
+    sync_stats['records_upserted'] += applied
+    if applied:
+        print(f"🔄 Sponsor mirror: {applied} changed record(s)")
+    return applied
+
+def full_sync(force: bool = False) -> int:
+    """
+    Mirror the whole table and drop records deleted in Airtable.
+
+    Returns the number of records mirrored, or -1 if another worker ran a
+    full sync recently.
+    """
+    conn = _get_conn()
+    # Until the first full sync succeeds, retry it on the delta schedule
+    interval = RECONCILE_INTERVAL if mirror_ready() else SYNC_INTERVAL
+    if not _claim_sync(conn, 'full', 0 if force else interval):
+        return -1
+
+    started = _now()
+    records = list(iter_airtable_records())
+
+    with _write_transaction(conn):
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS seen_ids (record_id TEXT PRIMARY KEY)')
+        conn.execute('DELETE FROM seen_ids')
+        conn.executemany('INSERT OR IGNORE INTO seen_ids VALUES (?)', [(r['id'],) for r in records])
+        deleted = conn.execute(
+            'DELETE FROM sponsors WHERE record_id NOT IN (SELECT record_id FROM seen_ids)'
+        ).rowcount
+        changed = _upsert(conn, records)
+        if changed or deleted:
+            _bump_version(conn)
+        _complete_sync(conn, 'full', started)
+
+    sync_stats['full_syncs'] += 1
+    sync_stats['records_upserted'] += changed
+    sync_stats['records_deleted'] += deleted
+    print(f"✅ Sponsor mirror: {len(records)} record(s) mirrored ({changed} changed), {deleted} deleted")
+    return len(records)
+
+def mirror_ready() -> bool:
+    """True once a full sync has completed"""
+    row = _get_conn().execute(
+        "SELECT completed_at FROM sync_state WHERE kind = 'full'"
+    ).fetchone()
+    return bool(row and row['completed_at'])
+
+def mirror_version() -> int:
+    """Changes whenever a sync (in any worker) changes the mirrored data"""
+    row = _get_conn().execute('SELECT version FROM data_version WHERE id = 1').fetchone()
+    return row['version'] if row else 0
+
+def mirror_status() -> Dict:
+    conn = _get_conn()
+    state = {
+        row['kind']: {'started_at': row['started_at'], 'completed_at': row['completed_at']}
+        for row in conn.execute('SELECT * FROM sync_state')
+    }
+    return {
+        'ready': mirror_ready(),
+        'records': conn.execute('SELECT COUNT(*) FROM sponsors').fetchone()[0],
+        'sync_state': state,
+        **sync_stats
+    }
+
+def sync_once() -> int:
+    """Full sync if none has completed within RECONCILE_INTERVAL, else a delta sync"""
+    full = _get_conn().execute("SELECT completed_at FROM sync_state WHERE kind = 'full'").fetchone()
+    if not (full and full['completed_at']):
+        return full_sync()
+    age = (_now() - datetime.fromisoformat(full['completed_at'])).total_seconds()
+    return full_sync() if age >= RECONCILE_INTERVAL else delta_sync()
+
+async def sync_loop(interval_seconds: float = SYNC_INTERVAL):
+    """Keep the mirror in sync (started from the app lifespan)"""
+    if not airtable_configured():
+        return
+    while True:
+        try:
+            await asyncio.to_thread(sync_once)
+        except Exception as e:
+            print(f"❌ Sponsor mirror sync failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+def query_mirror(query) -> List[dict]:
+    """Sponsors matching a sponsor_query() from the mirror"""
+    filters, fields, sort = query
+
+    where, params = [], []
+    for field, value in filters:
+        where.append(f"LOWER({_field_expr(field)}) = ?")
+        params.append(value)
+
+    order = [f"{_field_expr(f.lstrip('-'))} {'DESC' if f.startswith('-') else 'ASC'}" for f in sort]
+    order.append('created_time')
+
+    sql = 'SELECT fields FROM sponsors'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY ' + ', '.join(order)
+
+    sponsors = [json.loads(row['fields']) for row in _get_conn().execute(sql, params)]
+    if fields:
+        sponsors = [{f: s[f] for f in fields if f in s} for s in sponsors]
+    return sponsors
+
+def find_sponsors(query) -> List[dict]:
+    """Sponsors matching a sponsor_query(): from the mirror once ready, else the Airtable cache"""
+    if mirror_ready():
+        return query_mirror(query)
+    return get_cached_sponsors(query)
+
+def find_records_by_field(field: str, values: List[str]) -> Dict[str, dict]:
+    """
+    {lowercased value: {'id', 'fields'}} for mirrored records whose field
+    matches one of values (case-insensitively). Empty until the mirror is ready.
+    """
+    if not values or not mirror_ready():
+        return {}
+    expr = f"LOWER({_field_expr(field)})"
+    placeholders = ', '.join('?' * len(values))
+    rows = _get_conn().execute(
+        f"SELECT record_id, {expr} AS value, fields FROM sponsors WHERE {expr} IN ({placeholders})",
+        [v.lower() for v in values]
+    )
+    return {row['value']: {'id': row['record_id'], 'fields': json.loads(row['fields'])} for row in rows}
@@ -0,0 +1,196 @@
+"""
+In-memory search over sponsor records.
+
+SponsorIndex holds, for the full sponsor list:
+    - an inverted index of word tokens (every text field) -> record ids
+    - exact-value facet postings (text / multi-select fields) -> record ids
+    - sorted (value, id) lists for numeric fields, for range filters;
+      "$5,000" and "5k" count as numbers
+
+get_sponsor_index() rebuilds it whenever the underlying data changes: a
+refreshed Airtable cache entry, or a mirror sync that changed records.
+"""
+
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.airtable import get_cached_sponsors, sponsor_query
+from core.sponsor_mirror import mirror_ready, mirror_version, query_mirror
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_NUMBER_RE = re.compile(r'^\s*\$?\s*(-?[\d,]*\.?\d+)\s*([km]?)\s*$', re.IGNORECASE)
+
+# Longer strings are only searchable as text, not usable as facet values
+MAX_FACET_VALUE_LENGTH = 80
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+def parse_number(value) -> Optional[float]:
+    """Numeric value of a field: 5000, "5000", "$5,000", "5k" -> 5000.0"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = _NUMBER_RE.match(value)
+    if not match:
+        return None
+    number = float(match.group(1).replace(',', ''))
+    return number * {'': 1, 'k': 1_000, 'm': 1_000_000}[match.group(2).lower()]
+
+def _text_values(value) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list):
+        return [v for v in value if isinstance(v, str)]
+    return []
+
+
+class SponsorIndex:
+
+    def __init__(self, sponsors: List[Dict[str, Any]]):
+        self.sponsors = sponsors
+        self.postings = defaultdict(set)                          # token -> ids
+        self.term_counts = [Counter() for _ in sponsors]          # id -> token counts
+        self.facets = defaultdict(lambda: defaultdict(set))       # field -> value -> ids
+        self.facet_labels = defaultdict(dict)                     # field -> value -> display
+        numeric = defaultdict(list)                               # field -> [(value, id)]
+
+        for doc_id, sponsor in enumerate(sponsors):
+            for field, value in sponsor.items():
+                for text in _text_values(value):
+                    tokens = _tokens(text)
+                    self.term_counts[doc_id].update(tokens)
+                    for token in tokens:
+                        self.postings[token].add(doc_id)
+                    if len(text) <= MAX_FACET_VALUE_LENGTH:
+                        key = text.strip().lower()
+                        self.facets[field][key].add(doc_id)
+                        self.facet_labels[field].setdefault(key, text.strip())
+                number = parse_number(value)
+                if number is not None:
+                    numeric[field].append((number, doc_id))
+
+        self.numeric = {field: sorted(pairs) for field, pairs in numeric.items()}
+        self.vocabulary = sorted(self.postings)
+
+    def _matching_tokens(self, prefix: str) -> List[str]:
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + '\uffff')
+        return self.vocabulary[start:end]
+
+    def _text_matches(self, query: str) -> Tuple[set, Dict[int, float]]:
+        """Ids containing every query word (as a word prefix), and tf-idf scores"""
+        ids, scores = None, defaultdict(float)
+        n = len(self.sponsors)
+        for word in _tokens(query):
+            word_ids = set()
+            for token in self._matching_tokens(word):
+                postings = self.postings[token]
+                word_ids |= postings
+                idf = math.log(1 + n / len(postings))
+                # Exact words score above prefix matches
+                weight = idf if token == word else idf * 0.5
+                for doc_id in postings:
+                    scores[doc_id] += weight * self.term_counts[doc_id][token]
+            ids = word_ids if ids is None else ids & word_ids
+        return (ids if ids is not None else set(range(n))), scores
+
+    def _range_matches(self, field: str, low: Optional[float], high: Optional[float]) -> set:
+        pairs = self.numeric.get(field, [])
+        start = 0 if low is None else bisect_left(pairs, (low, -1))
+        end = len(pairs) if high is None else bisect_right(pairs, (high, len(self.sponsors)))
+        return {doc_id for _, doc_id in pairs[start:end]}
+
+    def search(self, text: str = '', filters: Dict[str, List[str]] = None,
+               ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = None,
+               facet_fields: List[str] = (), sort: List[str] = (), limit: int = 10) -> Dict[str, Any]:
+        """
+        Sponsors matching all of:
+            text     every word, anywhere in the record
+            filters  field -> accepted values (exact, case-insensitive; any of)
+            ranges   field -> (min, max), either end None for open
+
+        Returns the top `limit` (by relevance, or by the sort fields,
+        '-field' for descending), the total match count and value counts
+        over all matches for each of facet_fields.
+        """
+        ids, scores = self._text_matches(text) if text.strip() else (set(range(len(self.sponsors))), {})
+
+        for field, values in (filters or {}).items():
+            postings = self.facets.get(field, {})
+            accepted = set()
+            for value in values:
+                accepted |= postings.get(value.strip().lower(), set())
+            ids &= accepted
+
+        for field, (low, high) in (ranges or {}).items():
+            ids &= self._range_matches(field, low, high)
+
+        facet_counts = {}
+        for field in facet_fields:
+            counts = {
+                self.facet_labels[field][value]: len(doc_ids & ids)
+                for value, doc_ids in self.facets.get(field, {}).items()
+            }
+            facet_counts[field] = dict(
+                sorted(((v, c) for v, c in counts.items() if c), key=lambda vc: -vc[1])
+            )
+
+        if sort:
+            ordered = sorted(ids)  # stable base order: table order
+            for field in reversed(sort):
+                name = field.lstrip('-')
+                present = [i for i in ordered if self.sponsors[i].get(name) is not None]
+                missing = [i for i in ordered if self.sponsors[i].get(name) is None]
+                present.sort(key=lambda i: self._sort_key(self.sponsors[i][name]),
+                             reverse=field.startswith('-'))
+                ordered = present + missing
+            top = ordered[:limit]
+        else:
+            top = heapq.nsmallest(limit, ids, key=lambda i: (-scores.get(i, 0.0), i))
+
+        return {
+            'results': [self.sponsors[i] for i in top],
+            'count': len(ids),
+            'facets': facet_counts,
+        }
+
+    @staticmethod
+    def _sort_key(value):
+        number = parse_number(value)
+        return (0, number, '') if number is not None else (1, 0, str(value).lower())
+
+
+_index = None
+_index_source = None
+_index_lock = threading.Lock()
+
+def get_sponsor_index() -> SponsorIndex:
+    """
+    Index over all sponsors, from the mirror once it is ready, else the
+    Airtable cache. Rebuilt when that data changes.
+    """
+    global _index, _index_source
+    if mirror_ready():
+        source = ('mirror', mirror_version())
+        load = lambda: query_mirror(sponsor_query())
+    else:
+        sponsors = get_cached_sponsors()
+        # The cache hands out the same list object until it is refreshed
+        source = ('cache', id(sponsors))
+        load = lambda: sponsors
+
+    with _index_lock:
+        if _index is None or _index_source != source:
+            _index = SponsorIndex(load())
+            _index_source = source
+        return _index
@@ -0,0 +1,130 @@
+"""
+In-process TTL cache with stale-while-revalidate and single-flight loads.
+
+Within ttl an entry is served as is. For max_stale seconds after that it is
+still served, while one background thread reloads it. Older or missing
+entries are loaded inline; concurrent callers for the same key wait for the
+one load in progress instead of starting their own.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SWRCache:
+    """Cache of loader(key) results"""
+
+    def __init__(self, name: str, loader: Callable[[Hashable], Any],
+                 ttl: float, max_stale: float, max_entries: int = 256):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()   # key -> (value, loaded_at)
+        self._inflight = {}             # key -> _Flight
+        self._generation = 0            # bumped by invalidate()
+        self._lock = threading.Lock()
+
+        self.counts = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'loads': 0, 'errors': 0}
+
+    def get(self, key: Hashable = None) -> Any:
+        """Cached value for key, loading it if missing or too old"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = time.monotonic() - loaded_at
+                if age < self.ttl:
+                    self.counts['hits'] += 1
+                    self._entries.move_to_end(key)
+                    return value
+                if age < self.ttl + self.max_stale:
+                    self.counts['stale_hits'] += 1
+                    revalidate = key not in self._inflight
+                else:
+                    entry = None
+            if entry is None:
+                self.counts['misses'] += 1
+
+        if entry is None:
+            return self._load(key)
+        if revalidate:
+            threading.Thread(
+                target=self._revalidate, args=(key,), name=f"{self.name}-refresh", daemon=True
+            ).start()
+        return value
+
+    def invalidate(self, *keys: Hashable):
+        """Drop the given keys, or every entry when called without any"""
+        with self._lock:
+            self._generation += 1
+            if not keys:
+                self._entries.clear()
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - loaded_at for _, loaded_at in self._entries.values()]
+            return {
+                **self.counts,
+                'entries': len(ages),
+                'oldest_age_seconds': round(max(ages), 1) if ages else None,
+                'ttl_seconds': self.ttl,
+                'max_stale_seconds': self.max_stale,
+            }
+
+    def _load(self, key):
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                generation = self._generation
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self.loader(key)
+            with self._lock:
+                self.counts['loads'] += 1
+                # Loaded before an invalidate(): hand it to the waiting callers
+                # but don't cache it
+                if generation == self._generation:
+                    self._entries[key] = (flight.value, time.monotonic())
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.counts['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _revalidate(self, key):
+        try:
+            self._load(key)
+        except Exception as e:
+            print(f"⚠️ {self.name} refresh failed, serving stale data: {e}")
@@ -1,9 +1,22 @@
+import copy
 import json
 import os
-from typing import Optional, Dict, Any
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows dev machines - thread lock only
+    fcntl = None
+
+# Where tokens live: 'file' (default, JSON file), 'sqlite' or 'redis'
+TOKEN_STORE_BACKEND = os.getenv('TOKEN_STORE_BACKEND', 'file').lower()
+
 # Store tokens in a JSON file (temporary solution)
 # Ensure the file path is relative to where the services are running
 if os.getenv('K_SERVICE'):
@@ -14,27 +27,313 @@ else:
     # Ensure parent directory exists
     os.makedirs(os.path.dirname(TOKEN_FILE), exist_ok=True)
 
-def _read_tokens() -> Dict[str, Any]:
-    """Read tokens from JSON file"""
-    if not os.path.exists(TOKEN_FILE):
-        return {}
+# SQLite backend database; point it at a mounted volume to outlive instances
+TOKEN_DB = os.getenv('TOKEN_DB') or os.path.join(os.path.dirname(TOKEN_FILE), 'user_tokens.db')
+
+# Redis backend (needs the redis package)
+TOKEN_REDIS_URL = os.getenv('TOKEN_REDIS_URL') or os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+
+# ============================================================================
+# FILE BACKEND
+# ============================================================================
+
+# Parsed token file shared by every function in this module. It is only
+# re-read when the file's (mtime, size, inode) signature changes, so repeated
+# lookups within a request cost a stat() instead of a parse.
+_cache = {'signature': None, 'data': {}}
+_cache_lock = threading.Lock()
+
+def _file_signature():
     try:
-        with open(TOKEN_FILE, 'r') as f:
-            return json.load(f)
-    except:
+        st = os.stat(TOKEN_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def _read_tokens() -> Dict[str, Any]:
+    """
+    Read tokens from JSON file (cached until the file changes).
+
+    The returned dict is shared - copy it before modifying.
+    """
+    signature = _file_signature()
+    if signature is None:
         return {}
 
+    with _cache_lock:
+        if _cache['signature'] == signature:
+            return _cache['data']
+
+        try:
+            with open(TOKEN_FILE, 'r') as f:
+                data = json.load(f)
+        except:
+            return {}
+
+        _cache['signature'] = signature
+        _cache['data'] = data
+        return data
+
+# Writers hold both locks for the whole read-modify-write: the thread lock
+# within this process, flock on a sidecar file across worker processes.
+# Readers take neither - the file is only ever swapped in whole by rename.
+_write_lock = threading.Lock()
+
+@contextmanager
+def _exclusive_write():
+    with _write_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(TOKEN_FILE), exist_ok=True)
+        with open(TOKEN_FILE + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 def _write_tokens(data: Dict[str, Any]):
-    """Write tokens to JSON file"""
-    # Ensure the file exists by creating it if needed
+    """Atomically replace the JSON file (call with _exclusive_write held)"""
+    directory = os.path.dirname(TOKEN_FILE)
+    os.makedirs(directory, exist_ok=True)
+
+    # Temp file in the same directory so os.replace is a same-filesystem rename
+    fd, tmp_path = tempfile.mkstemp(prefix='.user_tokens.', suffix='.tmp', dir=directory)
     try:
-        with open(TOKEN_FILE, 'w') as f:
-            json.dump(data, indent=2, fp=f)
-    except FileNotFoundError:
-        # Create the file and parent directory if they don't exist
-        os.makedirs(os.path.dirname(TOKEN_FILE), exist_ok=True)
-        with open(TOKEN_FILE, 'w') as f:
+        with os.fdopen(fd, 'w') as f:
             json.dump(data, indent=2, fp=f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, TOKEN_FILE)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    with _cache_lock:
+        _cache['signature'] = _file_signature()
+        _cache['data'] = data
+
+@contextmanager
+def _update_tokens():
+    """
+    Read-modify-write the token file under the writer locks.
+
+    Yields a private copy of the current tokens; it is written back if the
+    block finishes without raising.
+    """
+    with _exclusive_write():
+        data = copy.deepcopy(_read_tokens())
+        yield data
+        _write_tokens(data)
+
+
+class FileTokenBackend:
+    """
+    All tokens in one JSON file (TOKEN_FILE).
+
+    Reads come from the in-process cache above; writes rewrite the whole file.
+    Fine for a handful of users on one instance.
+    """
+
+    def get(self, user_id: str, service_name: str) -> Optional[Dict[str, Any]]:
+        token_data = _read_tokens().get(user_id, {}).get(service_name)
+        return copy.deepcopy(token_data) if token_data is not None else None
+
+    def get_user(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(_read_tokens().get(user_id, {}))
+
+    def put(self, user_id: str, service_name: str, token_data: Dict[str, Any]):
+        with _update_tokens() as data:
+            data.setdefault(user_id, {})[service_name] = token_data
+
+    def delete(self, user_id: str, service_name: str) -> bool:
+        with _exclusive_write():
+            data = copy.deepcopy(_read_tokens())
+            if user_id not in data or service_name not in data[user_id]:
+                return False
+            del data[user_id][service_name]
+            _write_tokens(data)
+            return True
+
+    def list_users(self, service_name: str) -> List[str]:
+        return [
+            user_id for user_id, services in _read_tokens().items()
+            if isinstance(services.get(service_name), dict)
+        ]
+
+
+# ============================================================================
+# SQLITE BACKEND
+# ============================================================================
+
+class SQLiteTokenBackend:
+    """
+    One row per (user_id, service) in TOKEN_DB.
+
+    Lookups are primary-key point reads, so their cost doesn't grow with the
+    number of users. Safe across worker processes (WAL, per-thread connections).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS tokens (
+                    user_id TEXT NOT NULL,
+                    service TEXT NOT NULL,
+                    token_data TEXT NOT NULL,
+                    PRIMARY KEY (user_id, service)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_tokens_service ON tokens(service)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id: str, service_name: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            'SELECT token_data FROM tokens WHERE user_id = ? AND service = ?',
+            (user_id, service_name)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_user(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        rows = self._conn().execute(
+            'SELECT service, token_data FROM tokens WHERE user_id = ?', (user_id,)
+        )
+        return {service: json.loads(token_data) for service, token_data in rows}
+
+    def put(self, user_id: str, service_name: str, token_data: Dict[str, Any]):
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO tokens (user_id, service, token_data) VALUES (?, ?, ?)',
+                (user_id, service_name, json.dumps(token_data))
+            )
+
+    def delete(self, user_id: str, service_name: str) -> bool:
+        with self._conn() as conn:
+            cursor = conn.execute(
+                'DELETE FROM tokens WHERE user_id = ? AND service = ?', (user_id, service_name)
+            )
+        return cursor.rowcount > 0
+
+    def list_users(self, service_name: str) -> List[str]:
+        rows = self._conn().execute('SELECT user_id FROM tokens WHERE service = ?', (service_name,))
+        return [user_id for (user_id,) in rows]
+
+    def is_empty(self) -> bool:
+        return self._conn().execute('SELECT 1 FROM tokens LIMIT 1').fetchone() is None
+
+    def import_tokens(self, tokens):
+        """Add (user_id, service, token_data) rows, keeping any already stored"""
+        with self._conn() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO tokens (user_id, service, token_data) VALUES (?, ?, ?)',
+                [(user_id, service, json.dumps(token_data)) for user_id, service, token_data in tokens]
+            )
+
+
+# ============================================================================
+# KEY-VALUE (REDIS) BACKEND
+# ============================================================================
+
+class RedisTokenBackend:
+    """
+    A hash per user (tokens:<user_id>, field = service) plus a set of users
+    per service (token-users:<service>) for list_users.
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("TOKEN_STORE_BACKEND=redis needs the redis package (pip install redis)")
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, user_id: str, service_name: str) -> Optional[Dict[str, Any]]:
+        token_data = self._redis.hget(f"tokens:{user_id}", service_name)
+        return json.loads(token_data) if token_data else None
+
+    def get_user(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        return {
+            service: json.loads(token_data)
+            for service, token_data in self._redis.hgetall(f"tokens:{user_id}").items()
+        }
+
+    def put(self, user_id: str, service_name: str, token_data: Dict[str, Any]):
+        pipe = self._redis.pipeline()
+        pipe.hset(f"tokens:{user_id}", service_name, json.dumps(token_data))
+        pipe.sadd(f"token-users:{service_name}", user_id)
+        pipe.execute()
+
+    def delete(self, user_id: str, service_name: str) -> bool:
+        pipe = self._redis.pipeline()
+        pipe.hdel(f"tokens:{user_id}", service_name)
+        pipe.srem(f"token-users:{service_name}", user_id)
+        removed, _ = pipe.execute()
+        return removed > 0
+
+    def list_users(self, service_name: str) -> List[str]:
+        return sorted(self._redis.smembers(f"token-users:{service_name}"))
+
+    def is_empty(self) -> bool:
+        return next(self._redis.scan_iter(match='tokens:*', count=100), None) is None
+
+    def import_tokens(self, tokens):
+        """Add (user_id, service, token_data) entries, keeping any already stored"""
+        pipe = self._redis.pipeline()
+        for user_id, service, token_data in tokens:
+            pipe.hsetnx(f"tokens:{user_id}", service, json.dumps(token_data))
+            pipe.sadd(f"token-users:{service}", user_id)
+        pipe.execute()
+
+
+def _import_token_file(backend):
+    """
+    Seed an empty SQLite/Redis store from TOKEN_FILE, so switching backends
+    keeps connected users connected (the file itself is left as is)
+    """
+    if not os.path.exists(TOKEN_FILE) or not backend.is_empty():
+        return
+    tokens = [
+        (user_id, service, token_data)
+        for user_id, services in _read_tokens().items()
+        for service, token_data in services.items()
+        if isinstance(token_data, dict)
+    ]
+    if tokens:
+        backend.import_tokens(tokens)
+        print(f"✅ Imported {len(tokens)} token(s) from {TOKEN_FILE}")
+
+def _make_backend(name: str):
+    if name == 'file':
+        return FileTokenBackend()
+    if name == 'sqlite':
+        backend = SQLiteTokenBackend(TOKEN_DB)
+    elif name == 'redis':
+        backend = RedisTokenBackend(TOKEN_REDIS_URL)
+    else:
+        raise ValueError(f"Unknown TOKEN_STORE_BACKEND: {name}")
+    _import_token_file(backend)
+    return backend
+
+_backend = _make_backend(TOKEN_STORE_BACKEND)
+if TOKEN_STORE_BACKEND != 'file':
+    print(f"🔑 Token store backend: {TOKEN_STORE_BACKEND}")
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
 
 def store_user_token(user_id: str, service_name: str, access_token: str, 
                      refresh_token: str = None, expires_at: str = None,
@@ -50,22 +349,13 @@ def store_user_token(user_id: str, service_name: str, access_token: str,
         expires_at: Token expiry time in ISO format (optional)
         additional_data: Any extra data to store (e.g., user's email from service)
     """
-    data = _read_tokens()
-    
-    # Create user entry if doesn't exist
-    if user_id not in data:
-        data[user_id] = {}
-    
-    # Store token data
-    data[user_id][service_name] = {
+    _backend.put(user_id, service_name, {
         'access_token': access_token,
         'refresh_token': refresh_token,
         'expires_at': expires_at,
         'connected_at': datetime.now().isoformat(),
         'additional_data': additional_data or {}
-    }
-    
-    _write_tokens(data)
+    })
     print(f"✅ Stored {service_name} token for user {user_id}")
 
 def get_user_token(user_id: str, service_name: str) -> Optional[str]:
@@ -79,15 +369,12 @@ def get_user_token(user_id: str, service_name: str) -> Optional[str]:
     Returns:
         Access token string or None if not found
     """
-    data = _read_tokens()
-    
-    if user_id not in data:
-        return None
+    token_data = _backend.get(user_id, service_name)
     
-    if service_name not in data[user_id]:
+    if token_data is None:
         return None
     
-    return data[user_id][service_name].get('access_token')
+    return token_data.get('access_token')
 
 def get_user_token_data(user_id: str, service_name: str) -> Optional[Dict[str, Any]]:
     """
@@ -100,12 +387,7 @@ def get_user_token_data(user_id: str, service_name: str) -> Optional[Dict[str, A
     Returns:
         Token data dict or None
     """
-    data = _read_tokens()
-    
-    if user_id not in data:
-        return None
-    
-    return data[user_id].get(service_name)
+    return _backend.get(user_id, service_name)
 
 def is_service_connected(user_id: str, service_name: str) -> bool:
     """
@@ -129,11 +411,7 @@ def disconnect_service(user_id: str, service_name: str):
         user_id: User identifier
         service_name: Service name
     """
-    data = _read_tokens()
-    
-    if user_id in data and service_name in data[user_id]:
-        del data[user_id][service_name]
-        _write_tokens(data)
+    if _backend.delete(user_id, service_name):
         print(f"✅ Disconnected {service_name} for user {user_id}")
 
 def get_all_connections(user_id: str) -> Dict[str, bool]:
@@ -146,8 +424,21 @@ def get_all_connections(user_id: str) -> Dict[str, bool]:
     Returns:
         Dict with service names as keys and connection status as values
     """
+    # One read for all services
+    user_services = _backend.get_user(user_id)
     return {
-        'apollo': is_service_connected(user_id, 'apollo'),
-        'clay': is_service_connected(user_id, 'clay'),
-        'hubspot': is_service_connected(user_id, 'hubspot')
-    }
\ No newline at end of file
+        service: user_services.get(service, {}).get('access_token') is not None
+        for service in ('apollo', 'clay', 'hubspot')
+    }
+
+def list_service_users(service_name: str) -> List[str]:
+    """
+    User IDs that have a stored token for a service
+    
+    Args:
+        service_name: Service name
+    
+    Returns:
+        List of user identifiers
+    """
+    return _backend.list_users(service_name)
@@ -1,72 +1,955 @@
-import uuid
 import json
+import base64
 import os
-from datetime import datetime
+import sqlite3
+import threading
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List
+from core.write_behind import WriteBehindBuffer
+from core.tracking_tokens import mint_tracking_id
 
 # Use /tmp in Cloud Run (persists during container lifetime)
+# TRACKING_DB is the SQLite store; TRACKING_FILE is the legacy JSON format,
+# still used for import/export.
+TRACKING_DB = os.getenv('TRACKING_DB') or ('/tmp/tracking.db' if os.getenv('K_SERVICE') else 'tracking.db')
 TRACKING_FILE = '/tmp/tracking_data.json' if os.getenv('K_SERVICE') else 'tracking_data.json'
+EVENTS_FILE = '/tmp/tracking_events.jsonl' if os.getenv('K_SERVICE') else 'tracking_events.jsonl'
 
-def _read_tracking_data():
-    if not os.path.exists(TRACKING_FILE):
+# Write-behind settings for pixel hits (flush on batch size or interval)
+FLUSH_BATCH = int(os.getenv('TRACKING_FLUSH_BATCH', '500'))
+FLUSH_INTERVAL = float(os.getenv('TRACKING_FLUSH_INTERVAL', '1.0'))
+
+# Per-email records and raw events older than this are rolled up into
+# daily_campaign_stats and deleted; the job runs every RETENTION_INTERVAL_HOURS
+RETENTION_DAYS = int(os.getenv('TRACKING_RETENTION_DAYS', '90'))
+RETENTION_INTERVAL_HOURS = float(os.getenv('TRACKING_RETENTION_INTERVAL_HOURS', '6'))
+
+# Time-series buckets: ISO timestamp prefix length per resolution, and how
+# long each resolution is kept (days; None = forever)
+TIMESERIES_RESOLUTIONS = {'minute': 16, 'hour': 13, 'day': 10}
+TIMESERIES_KEEP_DAYS = {
+    'minute': int(os.getenv('TRACKING_MINUTE_BUCKET_DAYS', '7')),
+    'hour': int(os.getenv('TRACKING_HOUR_BUCKET_DAYS', '90')),
+    'day': None
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    tracking_id TEXT PRIMARY KEY,
+    recipient   TEXT NOT NULL,
+    campaign_id TEXT NOT NULL,
+    sent_at     TEXT NOT NULL,
+    opened      INTEGER NOT NULL DEFAULT 0,
+    opened_at   TEXT,
+    open_count  INTEGER NOT NULL DEFAULT 0,
+    click_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_emails_campaign ON emails (campaign_id, sent_at);
+CREATE INDEX IF NOT EXISTS idx_emails_recipient ON emails (recipient, sent_at);
+CREATE INDEX IF NOT EXISTS idx_emails_sent_at ON emails (sent_at);
+
+-- Append-only open/click log; emails is the materialized view over it
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    tracking_id TEXT NOT NULL,
+    campaign_id TEXT NOT NULL,
+    type        TEXT NOT NULL,
+    ts          TEXT NOT NULL,
+    url         TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_tracking ON events (tracking_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_campaign ON events (campaign_id, type, ts);
+
+-- Running counters per campaign, plus one row for all campaigns
+CREATE TABLE IF NOT EXISTS campaign_stats (
+    campaign_id    TEXT PRIMARY KEY,
+    total_emails   INTEGER NOT NULL DEFAULT 0,
+    opened_emails  INTEGER NOT NULL DEFAULT 0,
+    open_events    INTEGER NOT NULL DEFAULT 0,
+    clicked_emails INTEGER NOT NULL DEFAULT 0,
+    click_events   INTEGER NOT NULL DEFAULT 0
+);
+
+-- Roll-up of expired per-email records, by campaign and send day
+CREATE TABLE IF NOT EXISTS daily_campaign_stats (
+    campaign_id    TEXT NOT NULL,
+    day            TEXT NOT NULL,
+    total_emails   INTEGER NOT NULL DEFAULT 0,
+    opened_emails  INTEGER NOT NULL DEFAULT 0,
+    open_events    INTEGER NOT NULL DEFAULT 0,
+    clicked_emails INTEGER NOT NULL DEFAULT 0,
+    click_events   INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (campaign_id, day)
+);
+
+-- Sends/opens/clicks per campaign in minute, hour and day buckets
+CREATE TABLE IF NOT EXISTS campaign_timeseries (
+    campaign_id TEXT NOT NULL,
+    resolution  TEXT NOT NULL,
+    bucket      TEXT NOT NULL,
+    sends       INTEGER NOT NULL DEFAULT 0,
+    opens       INTEGER NOT NULL DEFAULT 0,
+    clicks      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (campaign_id, resolution, bucket)
+);
+
+-- One-time markers (e.g. that the legacy JSON import has run)
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- Bulk sends (POST /email/campaigns) and each recipient's delivery status
+-- heartbeat_at is refreshed by the worker sending it; a stale heartbeat
+-- means that worker went away
+CREATE TABLE IF NOT EXISTS campaign_sends (
+    send_id      TEXT PRIMARY KEY,
+    campaign_id  TEXT NOT NULL,
+    created_at   TEXT NOT NULL,
+    heartbeat_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_campaign_sends_created ON campaign_sends (created_at);
+
+CREATE TABLE IF NOT EXISTS campaign_deliveries (
+    send_id     TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    recipient   TEXT NOT NULL,
+    tracking_id TEXT NOT NULL,
+    status      TEXT NOT NULL,      -- queued, sending, sent, failed, unknown or aborted
+    message_id  TEXT,
+    error       TEXT,
+    updated_at  TEXT NOT NULL,
+    PRIMARY KEY (send_id, position)
+) WITHOUT ROWID;
+"""
+
+# campaign_stats row that aggregates every campaign
+ALL_CAMPAIGNS = '*'
+
+_COUNTERS = ('total_emails', 'opened_emails', 'open_events', 'clicked_emails', 'click_events')
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+# ============================================================================
+# CONNECTION & SCHEMA
+# ============================================================================
+
+def _connect():
+    # timeout is SQLite's busy timeout: other workers holding the write lock
+    # make us wait rather than fail
+    conn = sqlite3.connect(TRACKING_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def _get_conn():
+    """Per-thread connection; the schema is created on first use"""
+    global _initialized
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.executescript(_SCHEMA)
+                # Several workers may start at once; holding the write lock makes
+                # the one-time migration and counter rebuild happen exactly once
+                with _write_transaction(conn):
+                    _add_click_key(conn)
+                    _add_send_heartbeat(conn)
+                    _import_legacy_data(conn)
+                    if not conn.execute('SELECT 1 FROM campaign_stats LIMIT 1').fetchone():
+                        _rebuild_counters(conn)
+                _initialized = True
+    return conn
+
+@contextmanager
+def _write_transaction(conn):
+    """
+    BEGIN IMMEDIATE ... COMMIT.
+
+    Takes SQLite's write lock up front, so reads made inside the transaction
+    (e.g. "was this email already opened?") can't be invalidated by another
+    process or thread before our writes land.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+def _add_click_key(conn):
+    """
+    Unique (tracking_id, ts, url) for clicks, so re-importing a JSON file
+    doesn't add its clicks again. Duplicates from older imports are dropped first.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_events_click'").fetchone():
+        return
+    conn.execute(
+        "DELETE FROM events WHERE type = 'click' AND id NOT IN "
+        "(SELECT MIN(id) FROM events WHERE type = 'click' GROUP BY tracking_id, ts, url)"
+    )
+    conn.execute(
+        "CREATE UNIQUE INDEX idx_events_click ON events (tracking_id, ts, url) WHERE type = 'click'"
+    )
+
+def _add_send_heartbeat(conn):
+    """campaign_sends.heartbeat_at for databases created before it existed"""
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(campaign_sends)')]
+    if 'heartbeat_at' not in columns:
+        conn.execute('ALTER TABLE campaign_sends ADD COLUMN heartbeat_at TEXT')
+
+def _import_legacy_data(conn):
+    """One-time migration from the JSON snapshot + event log into a new DB"""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+        return
+    # Databases created before the marker existed: anything already stored
+    # (even if retention has since rolled every email up) means it ran
+    done = (conn.execute('SELECT 1 FROM emails LIMIT 1').fetchone()
+            or conn.execute('SELECT 1 FROM daily_campaign_stats LIMIT 1').fetchone())
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (datetime.now().isoformat(),)
+    )
+    if done:
+        return
+
+    data = _read_json(TRACKING_FILE)
+    if os.path.exists(EVENTS_FILE):
+        with open(EVENTS_FILE, 'r') as f:
+            for line in f:
+                try:
+                    _apply_legacy_event(data, json.loads(line))
+                except (ValueError, KeyError):
+                    continue
+
+    if data:
+        _bump_counters(conn, _insert_records(conn, data))
+        print(f"✅ Imported {len(data)} tracking records into {TRACKING_DB}")
+
+def _apply_legacy_event(data, event):
+    tracking_id = event['id']
+    if event['type'] == 'create':
+        data[tracking_id] = {
+            'recipient': event['recipient'],
+            'campaign_id': event['campaign_id'],
+            'sent_at': event['ts'],
+            'opened': False,
+            'opened_at': None,
+            'open_count': 0,
+            'click_count': 0,
+            'clicks': []
+        }
+    elif event['type'] == 'open' and tracking_id in data:
+        record = data[tracking_id]
+        if not record['opened']:
+            record['opened'] = True
+            record['opened_at'] = event['ts']
+        record['open_count'] += 1
+
+
+# ============================================================================
+# JSON IMPORT / EXPORT
+# ============================================================================
+
+def _read_json(path):
+    if not os.path.exists(path):
         return {}
     try:
-        with open(TRACKING_FILE, 'r') as f:
+        with open(path, 'r') as f:
             return json.load(f)
     except:
         return {}
 
-def _write_tracking_data(data):
-    with open(TRACKING_FILE, 'w') as f:
-        json.dump(data, indent=2, fp=f)
+def _insert_records(conn, data):
+    """
+    Upsert records (and their click events); returns the counter deltas
+    ({campaign_id: {counter: n}}) against what was stored before
+    """
+    deltas = {}
+    for tracking_id, record in data.items():
+        old = conn.execute(
+            'SELECT campaign_id, opened, open_count, click_count FROM emails WHERE tracking_id = ?',
+            (tracking_id,)
+        ).fetchone()
+        if old is not None:
+            counters = deltas.setdefault(old['campaign_id'], {})
+            for name, n in (('total_emails', 1), ('opened_emails', old['opened']),
+                            ('open_events', old['open_count']), ('clicked_emails', int(old['click_count'] > 0)),
+                            ('click_events', old['click_count'])):
+                counters[name] = counters.get(name, 0) - n
+        counters = deltas.setdefault(record.get('campaign_id', 'default'), {})
+        for name, n in (('total_emails', 1), ('opened_emails', int(bool(record.get('opened')))),
+                        ('open_events', record.get('open_count', 0)),
+                        ('clicked_emails', int(record.get('click_count', 0) > 0)),
+                        ('click_events', record.get('click_count', 0))):
+            counters[name] = counters.get(name, 0) + n
 
+        conn.execute(
+            'INSERT OR REPLACE INTO emails (tracking_id, recipient, campaign_id, sent_at, '
+            'opened, opened_at, open_count, click_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (tracking_id, record.get('recipient', ''), record.get('campaign_id', 'default'),
+             record.get('sent_at') or datetime.now().isoformat(),
+             int(bool(record.get('opened'))), record.get('opened_at'),
+             record.get('open_count', 0), record.get('click_count', 0))
+        )
+        for click in record.get('clicks', []):
+            # Already-imported clicks hit idx_events_click and are skipped
+            conn.execute(
+                'INSERT OR IGNORE INTO events (tracking_id, campaign_id, type, ts, url) VALUES (?, ?, ?, ?, ?)',
+                (tracking_id, record.get('campaign_id', 'default'), 'click',
+                 click.get('clicked_at'), click.get('url'))
+            )
+    return deltas
 
-def create_tracking_id(recipient: str, campaign_id: str = "default") -> str:
-    """Create new tracking ID"""
-    tracking_id = str(uuid.uuid4())
-    
-    data = _read_tracking_data()
-    data[tracking_id] = {
-        'recipient': recipient,
-        'campaign_id': campaign_id,
-        'sent_at': datetime.now().isoformat(),
-        'opened': False,
-        'opened_at': None,
-        'open_count': 0,
-        'click_count': 0,
-        'clicks': []
+def import_json(path: str = TRACKING_FILE) -> int:
+    """Load records from a tracking_data.json-style file, returns the count"""
+    data = _read_json(path)
+    conn = _get_conn()
+    with _write_transaction(conn):
+        _bump_counters(conn, _insert_records(conn, data))
+    return len(data)
+
+def export_json(path: str = TRACKING_FILE) -> int:
+    """Write all records to a tracking_data.json-style file, returns the count"""
+    count = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write('{')
+        for record in iter_tracking_records():
+            tracking_id = record.pop('tracking_id')
+            f.write(',' if count else '')
+            f.write(f"\n  {json.dumps(tracking_id)}: {json.dumps(record)}")
+            count += 1
+        f.write('\n}\n')
+    os.replace(tmp_path, path)
+    return count
+
+
+# ============================================================================
+# COUNTERS
+# ============================================================================
+
+def _rebuild_counters(conn):
+    """
+    Recompute campaign_stats from the emails table and the retention
+    roll-ups (full scan, for databases without counters yet)
+    """
+    conn.execute('DELETE FROM campaign_stats')
+    conn.execute(
+        'INSERT INTO campaign_stats (campaign_id, total_emails, opened_emails, open_events, '
+        'clicked_emails, click_events) '
+        'SELECT campaign_id, SUM(total_emails), SUM(opened_emails), SUM(open_events), '
+        'SUM(clicked_emails), SUM(click_events) FROM ('
+        '  SELECT campaign_id, COUNT(*) AS total_emails, SUM(opened) AS opened_emails, '
+        '  SUM(open_count) AS open_events, SUM(click_count > 0) AS clicked_emails, '
+        '  SUM(click_count) AS click_events FROM emails GROUP BY campaign_id '
+        '  UNION ALL '
+        '  SELECT campaign_id, total_emails, opened_emails, open_events, clicked_emails, '
+        '  click_events FROM daily_campaign_stats'
+        ') GROUP BY campaign_id'
+    )
+    conn.execute(
+        'INSERT INTO campaign_stats (campaign_id, total_emails, opened_emails, open_events, '
+        'clicked_emails, click_events) '
+        'SELECT ?, COALESCE(SUM(total_emails), 0), COALESCE(SUM(opened_emails), 0), '
+        'COALESCE(SUM(open_events), 0), COALESCE(SUM(clicked_emails), 0), '
+        'COALESCE(SUM(click_events), 0) FROM campaign_stats',
+        (ALL_CAMPAIGNS,)
+    )
+
+def _bump_counters(conn, deltas):
+    """Apply {campaign_id: {counter: n}} to campaign_stats and the overall row"""
+    overall = {}
+    for counters in deltas.values():
+        for name, n in counters.items():
+            overall[name] = overall.get(name, 0) + n
+    deltas = dict(deltas)
+    deltas[ALL_CAMPAIGNS] = overall
+
+    for campaign_id, counters in deltas.items():
+        values = [counters.get(name, 0) for name in _COUNTERS]
+        conn.execute(
+            f"INSERT INTO campaign_stats (campaign_id, {', '.join(_COUNTERS)}) "
+            f"VALUES (?, {', '.join('?' for _ in _COUNTERS)}) "
+            f"ON CONFLICT (campaign_id) DO UPDATE SET "
+            + ', '.join(f"{name} = {name} + excluded.{name}" for name in _COUNTERS),
+            [campaign_id] + values
+        )
+
+def _bump_timeseries(campaign_id, ts, deltas, column, n=1):
+    """Accumulate n into every resolution's bucket for ts (applied by _flush_timeseries)"""
+    for resolution, length in TIMESERIES_RESOLUTIONS.items():
+        key = (campaign_id, resolution, ts[:length])
+        counts = deltas.setdefault(key, {'sends': 0, 'opens': 0, 'clicks': 0})
+        counts[column] += n
+
+def _flush_timeseries(conn, deltas):
+    conn.executemany(
+        'INSERT INTO campaign_timeseries (campaign_id, resolution, bucket, sends, opens, clicks) '
+        'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (campaign_id, resolution, bucket) DO UPDATE SET '
+        'sends = sends + excluded.sends, opens = opens + excluded.opens, clicks = clicks + excluded.clicks',
+        [(*key, c['sends'], c['opens'], c['clicks']) for key, c in deltas.items()]
+    )
+
+def _format_stats(row):
+    counters = {name: (row[name] if row else 0) for name in _COUNTERS}
+    total = counters['total_emails']
+    return {
+        'total_emails': total,
+        'total_opens': counters['opened_emails'],
+        'open_events': counters['open_events'],
+        'total_clicks': counters['click_events'],
+        'clicked_emails': counters['clicked_emails'],
+        'open_rate': f"{(counters['opened_emails']/total*100):.1f}%" if total > 0 else "0%",
+        'click_rate': f"{(counters['clicked_emails']/total*100):.1f}%" if total > 0 else "0%"
     }
-    
-    _write_tracking_data(data)
-    return tracking_id
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
+
+def _rows_to_records(conn, rows):
+    """Build API records for a page of emails rows (one query for all clicks)"""
+    clicks = {row['tracking_id']: [] for row in rows}
+    if clicks:
+        placeholders = ', '.join('?' for _ in clicks)
+        for c in conn.execute(
+            f"SELECT tracking_id, url, ts FROM events WHERE type = 'click' "
+            f"AND tracking_id IN ({placeholders}) ORDER BY ts",
+            list(clicks)
+        ):
+            clicks[c['tracking_id']].append({'url': c['url'], 'clicked_at': c['ts']})
+
+    return [{
+        'tracking_id': row['tracking_id'],
+        'recipient': row['recipient'],
+        'campaign_id': row['campaign_id'],
+        'sent_at': row['sent_at'],
+        'opened': bool(row['opened']),
+        'opened_at': row['opened_at'],
+        'open_count': row['open_count'],
+        'click_count': row['click_count'],
+        'clicks': clicks[row['tracking_id']]
+    } for row in rows]
+
+def _encode_cursor(ts, key):
+    raw = f"{ts}|{key}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    """(timestamp, key) from a page cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        ts, key = raw.split('|', 1)
+        return ts, key
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+def create_tracking_id(recipient: str, campaign_id: str = "default") -> str:
+    """Create new (signed) tracking ID"""
+    return create_tracking_ids([recipient], campaign_id)[0]
+
+def create_tracking_ids(recipients: List[str], campaign_id: str = "default") -> List[str]:
+    """Mint tracking IDs for a whole campaign in one transaction, in recipient order"""
+    if not recipients:
+        return []
+
+    sent_at = datetime.now().isoformat()
+    tracking_ids = [mint_tracking_id(campaign_id) for _ in recipients]
+
+    conn = _get_conn()
+    with _write_transaction(conn):
+        conn.executemany(
+            'INSERT INTO emails (tracking_id, recipient, campaign_id, sent_at) VALUES (?, ?, ?, ?)',
+            [(tracking_id, recipient, campaign_id, sent_at)
+             for tracking_id, recipient in zip(tracking_ids, recipients)]
+        )
+        _bump_counters(conn, {campaign_id: {'total_emails': len(recipients)}})
+        series = {}
+        _bump_timeseries(campaign_id, sent_at, series, 'sends', len(recipients))
+        _flush_timeseries(conn, series)
+    return tracking_ids
+
+# Called with the list of emails opened for the first time by each
+# record_events() batch, after it has committed
+_first_open_listeners = []
+
+def on_first_open(listener):
+    """Register listener([{tracking_id, recipient, campaign_id, opened_at}, ...])"""
+    _first_open_listeners.append(listener)
+
+def record_events(events):
+    """Write a batch of open/click events and their counter updates in one transaction"""
+    if not events:
+        return
+
+    deltas = {}
+    series = {}
+    first_opens = []
+    conn = _get_conn()
+    with _write_transaction(conn):
+        for event in events:
+            tracking_id, ts = event['tracking_id'], event['ts']
+            event_type = event.get('type', 'open')
+            row = conn.execute(
+                'SELECT campaign_id, recipient, opened, click_count FROM emails WHERE tracking_id = ?',
+                (tracking_id,)
+            ).fetchone()
+
+            # Signed IDs carry their campaign, so campaign counters don't depend
+            # on the per-email record still being there
+            campaign_id = event.get('campaign_id') or (row['campaign_id'] if row else None)
+            if campaign_id is None:
+                # Unknown legacy tracking ID
+                continue
+
+            inserted = conn.execute(
+                'INSERT OR IGNORE INTO events (tracking_id, campaign_id, type, ts, url) VALUES (?, ?, ?, ?, ?)',
+                (tracking_id, campaign_id, event_type, ts, event.get('url'))
+            ).rowcount
+            if not inserted:
+                # The same click already recorded
+                continue
+
+            counters = deltas.setdefault(campaign_id, {})
+            _bump_timeseries(campaign_id, ts, series, 'clicks' if event_type == 'click' else 'opens')
+            if event_type == 'click':
+                counters['click_events'] = counters.get('click_events', 0) + 1
+                if row is not None:
+                    conn.execute(
+                        'UPDATE emails SET click_count = click_count + 1 WHERE tracking_id = ?',
+                        (tracking_id,)
+                    )
+                    if row['click_count'] == 0:
+                        counters['clicked_emails'] = counters.get('clicked_emails', 0) + 1
+            else:
+                counters['open_events'] = counters.get('open_events', 0) + 1
+                if row is not None:
+                    conn.execute(
+                        'UPDATE emails SET open_count = open_count + 1, '
+                        'opened_at = COALESCE(opened_at, ?), opened = 1 WHERE tracking_id = ?',
+                        (ts, tracking_id)
+                    )
+                    if not row['opened']:
+                        counters['opened_emails'] = counters.get('opened_emails', 0) + 1
+                        first_opens.append({
+                            'tracking_id': tracking_id, 'recipient': row['recipient'],
+                            'campaign_id': campaign_id, 'opened_at': ts
+                        })
+
+        _bump_counters(conn, deltas)
+        _flush_timeseries(conn, series)
+
+    if first_opens:
+        for listener in _first_open_listeners:
+            try:
+                listener(first_opens)
+            except Exception as e:
+                print(f"⚠️ First-open listener failed: {e}")
 
 def record_email_open(tracking_id: str):
     """Record email open event"""
-    data = _read_tracking_data()
-    
-    if tracking_id in data:
-        if not data[tracking_id]['opened']:
-            data[tracking_id]['opened'] = True
-            data[tracking_id]['opened_at'] = datetime.now().isoformat()
-        
-        data[tracking_id]['open_count'] += 1
-        _write_tracking_data(data)
+    record_events([{'type': 'open', 'tracking_id': tracking_id, 'ts': datetime.now().isoformat()}])
+
+_event_buffer = WriteBehindBuffer(
+    'tracking', record_events, max_batch=FLUSH_BATCH, flush_interval=FLUSH_INTERVAL
+)
+
+def enqueue_email_open(tracking_id: str, campaign_id: str = None):
+    """Queue an open for the background writer; returns without touching disk"""
+    _event_buffer.put({
+        'type': 'open', 'tracking_id': tracking_id, 'campaign_id': campaign_id,
+        'ts': datetime.now().isoformat()
+    })
+
+def enqueue_email_click(tracking_id: str, url: str, campaign_id: str = None):
+    """Queue a link click for the background writer"""
+    _event_buffer.put({
+        'type': 'click', 'tracking_id': tracking_id, 'campaign_id': campaign_id, 'url': url,
+        'ts': datetime.now().isoformat()
+    })
+
+def start_event_writer():
+    _event_buffer.start()
+
+def stop_event_writer():
+    """Drain queued events to the store (call on shutdown)"""
+    _event_buffer.stop()
 
 def get_tracking_stats(tracking_id: str = None):
-    """Get tracking statistics"""
-    data = _read_tracking_data()
-    
+    """Get tracking statistics (one email, or overall counters)"""
+    conn = _get_conn()
+
     if tracking_id:
-        return data.get(tracking_id, {})
-    
-    # Overall stats
-    total = len(data)
-    opened = sum(1 for v in data.values() if v.get('opened', False))
-    
+        rows = conn.execute('SELECT * FROM emails WHERE tracking_id = ?', (tracking_id,)).fetchall()
+        if not rows:
+            return {}
+        record = _rows_to_records(conn, rows)[0]
+        del record['tracking_id']
+        return record
+
+    return get_campaign_stats(ALL_CAMPAIGNS)
+
+def get_campaign_stats(campaign_id: str):
+    """Counters for one campaign (ALL_CAMPAIGNS for the overall totals)"""
+    row = _get_conn().execute(
+        'SELECT * FROM campaign_stats WHERE campaign_id = ?', (campaign_id,)
+    ).fetchone()
+    return _format_stats(row)
+
+def list_campaigns():
+    """Counters for every campaign"""
+    rows = _get_conn().execute(
+        'SELECT * FROM campaign_stats WHERE campaign_id != ? ORDER BY campaign_id', (ALL_CAMPAIGNS,)
+    )
+    return {row['campaign_id']: _format_stats(row) for row in rows}
+
+def query_events(campaign_id: str, event_type: str = None, since: str = None, until: str = None,
+                 limit: int = 100, cursor: str = None):
+    """
+    One page of open/click events for a campaign in [since, until) (ISO
+    timestamps), keyset-paginated on (ts, id) like list_tracking_records.
+    Returns (events, next_cursor).
+    """
+    sql = 'SELECT id, tracking_id, campaign_id, type, ts, url FROM events WHERE campaign_id = ?'
+    params = [campaign_id]
+    if event_type:
+        sql += ' AND type = ?'
+        params.append(event_type)
+    if since:
+        sql += ' AND ts >= ?'
+        params.append(since)
+    if until:
+        sql += ' AND ts < ?'
+        params.append(until)
+    if cursor:
+        ts, event_id = _decode_cursor(cursor)
+        if not event_id.isdigit():
+            raise ValueError("Invalid cursor")
+        sql += ' AND (ts, id) > (?, ?)'
+        params.extend([ts, int(event_id)])
+    sql += ' ORDER BY ts, id LIMIT ?'
+    params.append(limit)
+
+    events = [dict(row) for row in _get_conn().execute(sql, params)]
+    next_cursor = _encode_cursor(events[-1]['ts'], events[-1]['id']) if len(events) == limit else None
+    return events, next_cursor
+
+def list_tracking_records(campaign_id: str = None, recipient: str = None,
+                          sent_after: str = None, sent_before: str = None,
+                          limit: int = 50, cursor: str = None):
+    """
+    One page of tracking records ordered by send time.
+
+    Keyset pagination on (sent_at, tracking_id): pass the returned
+    next_cursor back in to get the following page. Returns
+    (records, next_cursor); next_cursor is None on the last page.
+    """
+    sql = 'SELECT * FROM emails WHERE 1 = 1'
+    params = []
+    if campaign_id:
+        sql += ' AND campaign_id = ?'
+        params.append(campaign_id)
+    if recipient:
+        sql += ' AND recipient = ?'
+        params.append(recipient)
+    if sent_after:
+        sql += ' AND sent_at >= ?'
+        params.append(sent_after)
+    if sent_before:
+        sql += ' AND sent_at < ?'
+        params.append(sent_before)
+    if cursor:
+        sql += ' AND (sent_at, tracking_id) > (?, ?)'
+        params.extend(_decode_cursor(cursor))
+    sql += ' ORDER BY sent_at, tracking_id LIMIT ?'
+    params.append(limit)
+
+    conn = _get_conn()
+    records = _rows_to_records(conn, conn.execute(sql, params).fetchall())
+    next_cursor = None
+    if len(records) == limit:
+        next_cursor = _encode_cursor(records[-1]['sent_at'], records[-1]['tracking_id'])
+    return records, next_cursor
+
+def iter_tracking_records(campaign_id: str = None, recipient: str = None,
+                          sent_after: str = None, sent_before: str = None,
+                          page_size: int = 500):
+    """Yield every matching record, reading one page at a time"""
+    cursor = None
+    while True:
+        records, cursor = list_tracking_records(
+            campaign_id, recipient, sent_after, sent_before, limit=page_size, cursor=cursor
+        )
+        yield from records
+        if cursor is None:
+            return
+
+
+# ============================================================================
+# RETENTION
+# ============================================================================
+
+def _roll_up_batch(conn, cutoff: str, batch_size: int) -> int:
+    """Roll up and delete one batch of expired emails, returns how many"""
+    tracking_ids = [row['tracking_id'] for row in conn.execute(
+        'SELECT tracking_id FROM emails WHERE sent_at < ? LIMIT ?', (cutoff, batch_size)
+    )]
+    if not tracking_ids:
+        return 0
+
+    placeholders = ', '.join('?' for _ in tracking_ids)
+    conn.execute(
+        f"INSERT INTO daily_campaign_stats (campaign_id, day, {', '.join(_COUNTERS)}) "
+        f"SELECT campaign_id, substr(sent_at, 1, 10), COUNT(*), SUM(opened), SUM(open_count), "
+        f"SUM(click_count > 0), SUM(click_count) FROM emails "
+        f"WHERE tracking_id IN ({placeholders}) GROUP BY campaign_id, substr(sent_at, 1, 10) "
+        f"ON CONFLICT (campaign_id, day) DO UPDATE SET "
+        + ', '.join(f"{name} = {name} + excluded.{name}" for name in _COUNTERS),
+        tracking_ids
+    )
+    conn.execute(f"DELETE FROM events WHERE tracking_id IN ({placeholders})", tracking_ids)
+    conn.execute(f"DELETE FROM emails WHERE tracking_id IN ({placeholders})", tracking_ids)
+    return len(tracking_ids)
+
+def apply_retention(retention_days: int = RETENTION_DAYS, batch_size: int = 500):
+    """
+    Roll per-email records sent before the retention window up into
+    daily_campaign_stats, drop their raw events, then compact the database.
+
+    Campaign counters are cumulative and untouched. Late events for emails
+    that were already rolled up only live in the counters, so their raw rows
+    are simply dropped once they age out too.
+    """
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    conn = _get_conn()
+
+    # Short transactions so pixel flushes from other workers aren't starved
+    rolled_up = 0
+    while True:
+        with _write_transaction(conn):
+            count = _roll_up_batch(conn, cutoff, batch_size)
+        rolled_up += count
+        if count < batch_size:
+            break
+
+    with _write_transaction(conn):
+        orphaned = conn.execute('DELETE FROM events WHERE ts < ?', (cutoff,)).rowcount
+        conn.execute(
+            'DELETE FROM campaign_deliveries WHERE send_id IN '
+            '(SELECT send_id FROM campaign_sends WHERE created_at < ?)', (cutoff,)
+        )
+        conn.execute('DELETE FROM campaign_sends WHERE created_at < ?', (cutoff,))
+        for resolution, keep_days in TIMESERIES_KEEP_DAYS.items():
+            if keep_days is not None:
+                oldest = (datetime.now() - timedelta(days=keep_days)).isoformat()
+                conn.execute(
+                    'DELETE FROM campaign_timeseries WHERE resolution = ? AND bucket < ?',
+                    (resolution, oldest[:TIMESERIES_RESOLUTIONS[resolution]])
+                )
+
+    # Give freed pages back and keep the WAL from growing without bound
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if page_count and free_pages / page_count > 0.25:
+        conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    if rolled_up or orphaned:
+        print(f"🧹 Tracking retention: rolled up {rolled_up} emails, dropped {orphaned} old events")
+    return {'rolled_up_emails': rolled_up, 'dropped_events': orphaned}
+
+async def retention_loop(interval_hours: float = RETENTION_INTERVAL_HOURS):
+    """Run apply_retention periodically (started from the app lifespan)"""
+    while True:
+        try:
+            await asyncio.to_thread(apply_retention)
+        except Exception as e:
+            print(f"❌ Tracking retention failed: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+def get_daily_stats(campaign_id: str, since: str = None, until: str = None):
+    """
+    Per-day counters (by send day) for a campaign in [since, until).
+
+    Combines the rolled-up history with records still in hot storage.
+    """
+    since = since or '0000-00-00'
+    until = until or '9999-99-99'
+    conn = _get_conn()
+
+    days = {}
+    for row in conn.execute(
+        'SELECT * FROM daily_campaign_stats WHERE campaign_id = ? AND day >= ? AND day < ?',
+        (campaign_id, since, until)
+    ):
+        days[row['day']] = {name: row[name] for name in _COUNTERS}
+
+    for row in conn.execute(
+        f"SELECT substr(sent_at, 1, 10) AS day, COUNT(*) AS total_emails, SUM(opened) AS opened_emails, "
+        f"SUM(open_count) AS open_events, SUM(click_count > 0) AS clicked_emails, "
+        f"SUM(click_count) AS click_events FROM emails "
+        f"WHERE campaign_id = ? AND sent_at >= ? AND sent_at < ? GROUP BY day",
+        (campaign_id, since, until)
+    ):
+        counters = days.setdefault(row['day'], {name: 0 for name in _COUNTERS})
+        for name in _COUNTERS:
+            counters[name] += row[name]
+
+    return [{'day': day, **_format_stats(counters)} for day, counters in sorted(days.items())]
+
+def get_timeseries(campaign_id: str, resolution: str = 'hour', since: str = None, until: str = None):
+    """Bucketed sends/opens/clicks for a campaign, buckets in [since, until)"""
+    if resolution not in TIMESERIES_RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(TIMESERIES_RESOLUTIONS)}")
+
+    rows = _get_conn().execute(
+        'SELECT bucket, sends, opens, clicks FROM campaign_timeseries '
+        'WHERE campaign_id = ? AND resolution = ? AND bucket >= ? AND bucket < ? ORDER BY bucket',
+        (campaign_id, resolution, since or '', until or '~')
+    )
+    return [dict(row) for row in rows]
+
+
+# ============================================================================
+# CAMPAIGN SENDS
+# ============================================================================
+
+def create_campaign_send(send_id: str, campaign_id: str, recipients: List[str], tracking_ids: List[str]):
+    """Record a bulk send with every recipient queued"""
+    now = datetime.now().isoformat()
+    conn = _get_conn()
+    with _write_transaction(conn):
+        conn.execute(
+            'INSERT INTO campaign_sends (send_id, campaign_id, created_at, heartbeat_at) VALUES (?, ?, ?, ?)',
+            (send_id, campaign_id, now, now)
+        )
+        conn.executemany(
+            'INSERT INTO campaign_deliveries (send_id, position, recipient, tracking_id, status, updated_at) '
+            "VALUES (?, ?, ?, ?, 'queued', ?)",
+            [(send_id, position, recipient, tracking_id, now)
+             for position, (recipient, tracking_id) in enumerate(zip(recipients, tracking_ids))]
+        )
+
+def touch_campaign_sends(send_ids: List[str]):
+    """Heartbeat for the sends this worker still has batches of"""
+    if not send_ids:
+        return
+    now = datetime.now().isoformat()
+    conn = _get_conn()
+    with _write_transaction(conn):
+        conn.executemany(
+            'UPDATE campaign_sends SET heartbeat_at = ? WHERE send_id = ?', [(now, s) for s in send_ids]
+        )
+
+def claim_deliveries(send_id: str, positions: List[int]) -> List[int]:
+    """
+    Move queued recipients to 'sending' and return the positions claimed;
+    anything else (e.g. aborted meanwhile) must not be sent
+    """
+    now = datetime.now().isoformat()
+    conn = _get_conn()
+    with _write_transaction(conn):
+        return [
+            position for position in positions
+            if conn.execute(
+                "UPDATE campaign_deliveries SET status = 'sending', updated_at = ? "
+                "WHERE send_id = ? AND position = ? AND status = 'queued'",
+                (now, send_id, position)
+            ).rowcount
+        ]
+
+def abort_deliveries(send_id: str, positions: List[int], error: str) -> int:
+    """Mark recipients that were never claimed 'aborted'; returns the number aborted"""
+    now = datetime.now().isoformat()
+    conn = _get_conn()
+    with _write_transaction(conn):
+        return sum(
+            conn.execute(
+                "UPDATE campaign_deliveries SET status = 'aborted', error = ?, updated_at = ? "
+                "WHERE send_id = ? AND position = ? AND status = 'queued'",
+                (error, now, send_id, position)
+            ).rowcount
+            for position in positions
+        )
+
+def record_deliveries(send_id: str, results):
+    """
+    Store [(position, status, message_id, error), ...] for claimed
+    ('sending') recipients of a bulk send; other rows are left alone
+    """
+    if not results:
+        return
+    now = datetime.now().isoformat()
+    conn = _get_conn()
+    with _write_transaction(conn):
+        conn.executemany(
+            'UPDATE campaign_deliveries SET status = ?, message_id = ?, error = ?, updated_at = ? '
+            "WHERE send_id = ? AND position = ? AND status = 'sending'",
+            [(status, message_id, error, now, send_id, position)
+             for position, status, message_id, error in results]
+        )
+
+def abort_stalled_deliveries(send_id: str, stalled_before: datetime) -> int:
+    """
+    If the send's heartbeat is older than stalled_before (the worker sending
+    it went away), mark its queued recipients 'aborted' and those it was
+    sending 'unknown'. Returns the number of recipients changed.
+    """
+    now = datetime.now().isoformat()
+    conn = _get_conn()
+    with _write_transaction(conn):
+        send = conn.execute(
+            'SELECT COALESCE(heartbeat_at, created_at) AS heartbeat_at FROM campaign_sends WHERE send_id = ?',
+            (send_id,)
+        ).fetchone()
+        if not send or send['heartbeat_at'] >= stalled_before.isoformat():
+            return 0
+        aborted = conn.execute(
+            "UPDATE campaign_deliveries SET status = 'aborted', error = ?, updated_at = ? "
+            "WHERE send_id = ? AND status = 'queued'",
+            ("Send stalled: the server stopped before sending", now, send_id)
+        ).rowcount
+        lost = conn.execute(
+            "UPDATE campaign_deliveries SET status = 'unknown', error = ?, updated_at = ? "
+            "WHERE send_id = ? AND status = 'sending'",
+            ("Delivery unknown: the server stopped while sending", now, send_id)
+        ).rowcount
+        return aborted + lost
+
+def get_campaign_send(send_id: str):
+    """A bulk send with per-recipient status, or None"""
+    conn = _get_conn()
+    send = conn.execute('SELECT * FROM campaign_sends WHERE send_id = ?', (send_id,)).fetchone()
+    if not send:
+        return None
+
+    recipients = [
+        {key: row[key] for key in ('recipient', 'tracking_id', 'status', 'message_id', 'error')}
+        for row in conn.execute(
+            'SELECT * FROM campaign_deliveries WHERE send_id = ? ORDER BY position', (send_id,)
+        )
+    ]
+    counts = {'queued': 0, 'sending': 0, 'sent': 0, 'failed': 0, 'unknown': 0, 'aborted': 0}
+    for recipient in recipients:
+        counts[recipient['status']] += 1
+
     return {
-        'total_emails': total,
-        'total_opens': opened,
-        'total_clicks': sum(v.get('click_count', 0) for v in data.values()),
-        'open_rate': f"{(opened/total*100):.1f}%" if total > 0 else "0%",
-        'click_rate': "0%",
-        'emails': data
-    }
\ No newline at end of file
+        'id': send['send_id'],
+        'campaign_id': send['campaign_id'],
+        'created_at': send['created_at'],
+        'status': 'sending' if counts['queued'] or counts['sending'] else 'done',
+        'counts': counts,
+        'recipients': recipients
+    }
@@ -0,0 +1,89 @@
+"""
+Write-behind buffer: callers enqueue items in memory and return immediately,
+a background thread hands them to a flush function in batches.
+"""
+
+import threading
+from collections import deque
+from typing import Callable, List, Any
+
+
+class WriteBehindBuffer:
+    """In-memory queue flushed on a size or time trigger"""
+
+    def __init__(self, name: str, flush_fn: Callable[[List[Any]], Any],
+                 max_batch: int = 500, flush_interval: float = 1.0,
+                 max_queue: int = 100_000):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.dropped = 0
+
+    def put(self, item: Any):
+        """Enqueue an item; never blocks on I/O"""
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append(item)
+
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        if len(self._queue) >= self.max_batch:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        """Start the background flusher (idempotent)"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f"{self.name}-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the flusher and drain whatever is still queued"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def flush(self):
+        """Synchronously write out everything currently queued"""
+        with self._flush_lock:
+            while self._queue:
+                batch = []
+                while self._queue and len(batch) < self.max_batch:
+                    batch.append(self._queue.popleft())
+                try:
+                    self.flush_fn(batch)
+                except Exception as e:
+                    print(f"❌ {self.name} flush failed ({len(batch)} items): {e}")
+                    # Put the batch back for the next tick unless we are over capacity
+                    if len(self._queue) + len(batch) <= self.max_queue:
+                        self._queue.extendleft(reversed(batch))
+                    else:
+                        self.dropped += len(batch)
+                    return
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
@@ -1,14 +1,42 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 import os
 
 # Load .env
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
 from routers import email, sponsors, events, tracking, airtable, payments, leads, oauth
+from core.tracking import start_event_writer, stop_event_writer, retention_loop
+from core.hubspot_auth import refresh_loop as hubspot_refresh_loop
+from core.sponsor_mirror import sync_loop as sponsor_sync_loop
+from core.airtable_writeback import start_writeback, stop_writeback
+from core.gmail import init_gmail
+from core.campaigns import heartbeat_loop as campaign_heartbeat_loop, stop_campaigns
+import asyncio
 
-app = FastAPI(title="Event Sponsor Services API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_gmail()
+    start_event_writer()
+    start_writeback()
+    retention_task = asyncio.create_task(retention_loop())
+    hubspot_refresh_task = asyncio.create_task(hubspot_refresh_loop())
+    sponsor_sync_task = asyncio.create_task(sponsor_sync_loop())
+    campaign_heartbeat_task = asyncio.create_task(campaign_heartbeat_loop())
+    yield
+    retention_task.cancel()
+    hubspot_refresh_task.cancel()
+    sponsor_sync_task.cancel()
+    campaign_heartbeat_task.cancel()
+    stop_campaigns()
+    # Drain queued tracking events before the process exits; this may queue
+    # first-open status updates, so the Airtable write-back drains after it
+    stop_event_writer()
+    stop_writeback()
+
+app = FastAPI(title="Event Sponsor Services API", lifespan=lifespan)
 
 # CORS - Allow frontend origins
 app.add_middleware(
@@ -1,11 +1,77 @@
-from fastapi import APIRouter
-from core.airtable import get_airtable_sponsors
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from core.airtable import (
+    iter_sponsors_from,
+    stream_sponsors_json,
+    sponsor_query,
+    invalidate_sponsor_cache,
+    sponsor_cache_stats
+)
+from core.airtable_client import AirtableError, get_airtable_client
+from core.sponsor_mirror import delta_sync, find_sponsors, full_sync, mirror_status
+from core.airtable_writeback import writeback_status
 
 router = APIRouter()
 
 @router.get("/sponsors")
-async def get_sponsors():
-    """Get all sponsors from Airtable"""
-    
-    sponsors = get_airtable_sponsors()
-    return {"sponsors": sponsors, "count": len(sponsors)}
\ No newline at end of file
+def get_sponsors(
+    fields: str = Query(default="", description="Comma-separated fields to return"),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    cursor: str = ""
+):
+    """Get sponsors from Airtable (all of them, or a page of `limit` from `cursor`)"""
+    try:
+        query = sponsor_query(fields=[f.strip() for f in fields.split(',') if f.strip()])
+        items = iter_sponsors_from(find_sponsors(query), cursor or None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AirtableError as e:
+        print(f"❌ Airtable error: {e}")
+        raise HTTPException(status_code=503, detail=f"Sponsor database unavailable: {e}")
+
+    return StreamingResponse(stream_sponsors_json(items, limit), media_type="application/json")
+
+@router.get("/cache")
+def get_cache_stats():
+    """Sponsor cache hit/miss counters and age"""
+    return sponsor_cache_stats()
+
+@router.post("/cache/invalidate")
+def invalidate_cache():
+    """
+    Drop cached sponsors (e.g. after editing the Airtable base). Once the
+    mirror is ready it answers sponsor queries, so pull its changes now too
+    (deleted records go at the next full sync, or POST /mirror/sync).
+    """
+    invalidate_sponsor_cache()
+    try:
+        synced = delta_sync(force=True)
+    except AirtableError as e:
+        raise HTTPException(status_code=502, detail=f"Airtable sync failed: {e}")
+    message = "Sponsor cache invalidated"
+    if synced >= 0:
+        message += f", mirror synced ({synced} changed record(s))"
+    return {"success": True, "message": message}
+
+@router.get("/mirror")
+def get_mirror_status():
+    """Local sponsor mirror: readiness, record count, last syncs"""
+    return mirror_status()
+
+@router.post("/mirror/sync")
+def sync_mirror():
+    """Run a full mirror sync now (also reconciles deletions)"""
+    try:
+        mirrored = full_sync(force=True)
+    except AirtableError as e:
+        raise HTTPException(status_code=502, detail=f"Airtable sync failed: {e}")
+    return {"success": True, "records": mirrored}
+
+@router.get("/metrics")
+def get_client_metrics():
+    """Airtable API call counts, retries, throttling and latency percentiles, plus write-back queue"""
+    client = get_airtable_client()
+    if client is None:
+        return {"configured": False}
+    return {"configured": True, **client.metrics(), "writeback": writeback_status()}
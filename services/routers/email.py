@@ -1,16 +1,42 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from core.gmail import send_gmail_with_tracking
-from core.tracking import create_tracking_id, get_tracking_stats
+from string import Template
+import html
+from typing import List
+import os
+from core.campaigns import MAX_RECIPIENTS, campaign_send_status, start_campaign
+from core.gmail import get_gmail_service, send_gmail_with_tracking
+from core.tracking import create_tracking_id, create_tracking_ids, get_campaign_send, get_tracking_stats
+from core.link_tracking import compile_tracked_template, render_tracked_html, tracking_pixel
+from core.airtable_writeback import enqueue_status
 
 router = APIRouter()
 
-class EmailFormatRequest(BaseModel):
-    sponsor_name: str
-    sponsor_email: str
+class OutreachSender(BaseModel):
     your_name: str
     your_company: str
     event_type: str
+    event_url: str = ""
+
+class EmailFormatRequest(OutreachSender):
+    sponsor_name: str
+    sponsor_email: str
+
+class SponsorContact(BaseModel):
+    sponsor_name: str
+    sponsor_email: str
+
+class EmailFormatBatchRequest(OutreachSender):
+    sponsors: List[SponsorContact]
+    campaign_id: str = "sponsor_outreach"
+
+class CampaignSendRequest(EmailFormatBatchRequest):
+    # Optional custom templates; $sponsor_name and $sponsor_email are filled
+    # per recipient, as are $your_name, $your_company, $event_type, $event_url.
+    # Any part left empty comes from the standard outreach email.
+    subject: str = ""
+    body: str = ""
+    body_html: str = ""
 
 class EmailSendRequest(BaseModel):
     recipient: str
@@ -19,44 +45,64 @@ class EmailSendRequest(BaseModel):
     body_html: str = ""
     tracking_id: str = ""
 
-@router.post("/format")
-async def format_email(request: EmailFormatRequest):
-    """Format outreach email with tracking"""
-    
-    # Create tracking ID
-    tracking_id = create_tracking_id(request.sponsor_email, "sponsor_outreach")
-    
-    # Build email content
-    subject = f"Collaboration opportunity with {request.your_company}"
-    
-    body = f"""Hello {request.sponsor_name},
+# HTML outreach template. $-placeholders shared by a whole campaign are filled
+# first, links are then rewritten for click tracking once per resulting
+# template, and ${sponsor_name} / ${tracking_id} are filled per recipient.
+OUTREACH_HTML_TEMPLATE = Template("""<html><body>
+<p>Hello ${sponsor_name},</p>
+<p>My name is $your_name and I'm with $your_company.</p>
+<p>I'm reaching out about an exciting $event_type event we're organizing. 
+I believe there could be a great partnership opportunity here.</p>
+$event_link
+<p>Would you be open to a brief conversation next week to explore this?</p>
+<p>Best regards,<br>
+$your_name<br>
+$your_company</p>
+$tracking_pixel
+</body></html>""")
+
+def _template_value(value: str) -> str:
+    """HTML-escaped, with $ kept literal through the per-recipient substitution"""
+    return html.escape(value, quote=True).replace('$', '$$')
+
+def _outreach_html_template(sender: OutreachSender) -> str:
+    """Tracked HTML template shared by every sponsor of this event/sender"""
+    base_url = os.getenv('SERVICES_URL', 'http://localhost:8001')
 
-My name is {request.your_name} and I'm with {request.your_company}.
+    event_link = ""
+    if sender.event_url:
+        event_url = _template_value(sender.event_url)
+        event_link = f'<p>Event details: <a href="{event_url}">{event_url}</a></p>'
 
-I'm reaching out about an exciting {request.event_type} event we're organizing. I believe there could be a great partnership opportunity here.
+    body_html = OUTREACH_HTML_TEMPLATE.safe_substitute(
+        your_name=_template_value(sender.your_name),
+        your_company=_template_value(sender.your_company),
+        event_type=_template_value(sender.event_type),
+        event_link=event_link,
+        tracking_pixel=tracking_pixel(base_url)
+    )
+    return compile_tracked_template(body_html, base_url)
 
+def _format_outreach(sender: OutreachSender, sponsor_name: str, tracking_id: str,
+                     html_template: str) -> dict:
+    """Subject, plain text and tracked HTML for one sponsor"""
+    subject = f"Collaboration opportunity with {sender.your_company}"
+    event_line = f"\nEvent details: {sender.event_url}\n" if sender.event_url else ""
+    
+    body = f"""Hello {sponsor_name},
+
+My name is {sender.your_name} and I'm with {sender.your_company}.
+
+I'm reaching out about an exciting {sender.event_type} event we're organizing. I believe there could be a great partnership opportunity here.
+{event_line}
 Would you be open to a brief conversation next week to explore this?
 
 Best regards,
-{request.your_name}
-{request.your_company}"""
+{sender.your_name}
+{sender.your_company}"""
     
-    # HTML version with tracking pixel
-    import os
-    base_url = os.getenv('SERVICES_URL', 'http://localhost:8001')
-    tracking_pixel = f'<img src="{base_url}/track/open/{tracking_id}" width="1" height="1" style="display:none;" alt="" />'
-    
-    body_html = f"""<html><body>
-<p>Hello {request.sponsor_name},</p>
-<p>My name is {request.your_name} and I'm with {request.your_company}.</p>
-<p>I'm reaching out about an exciting {request.event_type} event we're organizing. 
-I believe there could be a great partnership opportunity here.</p>
-<p>Would you be open to a brief conversation next week to explore this?</p>
-<p>Best regards,<br>
-{request.your_name}<br>
-{request.your_company}</p>
-{tracking_pixel}
-</body></html>"""
+    # HTML version with tracking pixel and tracked links
+    body_html = render_tracked_html(html_template, tracking_id, sponsor_name=html.escape(sponsor_name))
     
     return {
         "subject": subject,
@@ -65,8 +111,119 @@ I believe there could be a great partnership opportunity here.</p>
         "tracking_id": tracking_id
     }
 
+@router.post("/format")
+def format_email(request: EmailFormatRequest):
+    """Format outreach email with open and click tracking"""
+    
+    # Create tracking ID
+    tracking_id = create_tracking_id(request.sponsor_email, "sponsor_outreach")
+    
+    return _format_outreach(
+        request, request.sponsor_name, tracking_id, _outreach_html_template(request)
+    )
+
+@router.post("/format-batch")
+def format_email_batch(request: EmailFormatBatchRequest):
+    """Format outreach emails for many sponsors, minting all tracking IDs at once"""
+    
+    tracking_ids = create_tracking_ids(
+        [sponsor.sponsor_email for sponsor in request.sponsors],
+        request.campaign_id
+    )
+    html_template = _outreach_html_template(request)
+    
+    emails = [
+        {
+            "recipient": sponsor.sponsor_email,
+            "sponsor_name": sponsor.sponsor_name,
+            **_format_outreach(request, sponsor.sponsor_name, tracking_id, html_template)
+        }
+        for sponsor, tracking_id in zip(request.sponsors, tracking_ids)
+    ]
+    
+    return {"campaign_id": request.campaign_id, "emails": emails, "count": len(emails)}
+
+def _text_to_html(text: str) -> str:
+    """Plain text as a minimal HTML body ($-placeholders survive escaping)"""
+    return "<html><body>" + html.escape(text).replace("\n", "<br>\n") + "</body></html>"
+
+def _campaign_renderer(request: CampaignSendRequest):
+    """
+    Compile the campaign's templates once; returns render(sponsor, tracking_id) -> message.
+
+    Parts without a custom template come from the standard outreach email.
+    The HTML part always carries the tracking pixel: a custom plain text
+    body without body_html is sent as escaped HTML too.
+    """
+    standard_html = _outreach_html_template(request)
+    
+    base_url = os.getenv('SERVICES_URL', 'http://localhost:8001')
+    sender_fields = {
+        'your_name': request.your_name,
+        'your_company': request.your_company,
+        'event_type': request.event_type,
+        'event_url': request.event_url
+    }
+    subject = Template(request.subject) if request.subject else None
+    body = Template(request.body) if request.body else None
+    html_template = None
+    if request.body_html or request.body:
+        body_html = request.body_html or _text_to_html(request.body)
+        if '/track/open/' not in body_html:
+            head, sep, tail = body_html.rpartition('</body>')
+            pixel = tracking_pixel(base_url)
+            body_html = head + pixel + sep + tail if sep else body_html + pixel
+        html_template = compile_tracked_template(body_html, base_url)
+    
+    def render(sponsor: SponsorContact, tracking_id: str) -> dict:
+        message = _format_outreach(request, sponsor.sponsor_name, tracking_id, standard_html)
+        fields = {**sender_fields, 'sponsor_name': sponsor.sponsor_name, 'sponsor_email': sponsor.sponsor_email}
+        if subject:
+            message["subject"] = subject.safe_substitute(fields)
+        if body:
+            message["body"] = body.safe_substitute(fields)
+        if html_template:
+            escaped = {key: html.escape(value) for key, value in fields.items()}
+            message["body_html"] = render_tracked_html(html_template, tracking_id, **escaped)
+        return message
+    
+    return render
+
+@router.post("/campaigns")
+def send_campaign(request: CampaignSendRequest):
+    """Send one email per sponsor through Gmail batch requests, in the background"""
+    
+    if not request.sponsors:
+        raise HTTPException(status_code=400, detail="No sponsors to send to")
+    if len(request.sponsors) > MAX_RECIPIENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RECIPIENTS} sponsors per campaign")
+    try:
+        get_gmail_service()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Gmail unavailable: {str(e)}")
+    
+    recipients = [sponsor.sponsor_email for sponsor in request.sponsors]
+    tracking_ids = create_tracking_ids(recipients, request.campaign_id)
+    render = _campaign_renderer(request)
+    messages = [
+        {"recipient": sponsor.sponsor_email, **render(sponsor, tracking_id)}
+        for sponsor, tracking_id in zip(request.sponsors, tracking_ids)
+    ]
+    
+    send_id = start_campaign(request.campaign_id, messages, tracking_ids)
+    return get_campaign_send(send_id)
+
+@router.get("/campaigns/{send_id}")
+def campaign_status(send_id: str):
+    """Delivery status of a campaign send, per recipient"""
+    
+    send = campaign_send_status(send_id)
+    if not send:
+        raise HTTPException(status_code=404, detail=f"No campaign send with ID: {send_id}")
+    return send
+
 @router.post("/send")
-async def send_email(request: EmailSendRequest):
+def send_email(request: EmailSendRequest):
     """Send email via Gmail with tracking"""
     
     try:
@@ -77,6 +234,9 @@ async def send_email(request: EmailSendRequest):
             body_html=request.body_html
         )
         
+        # Mark the sponsor as contacted in Airtable (batched, in the background)
+        enqueue_status(request.recipient, 'contacted')
+        
         result_message = f"✅ Email sent to {request.recipient}"
         if request.tracking_id:
             result_message += f"\n📊 Tracking ID: {request.tracking_id}"
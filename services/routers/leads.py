@@ -4,7 +4,7 @@ from typing import List, Dict, Any
 import requests
 import json
 import re
-from core.token_store import get_user_token
+from core.hubspot_auth import get_valid_hubspot_token
 
 router = APIRouter()
 
@@ -288,8 +288,8 @@ async def sync_contacts_to_hubspot(request: SyncContactsRequest):
         Success message with sync statistics
     """
     try:
-        # Get HubSpot OAuth token for demo_user from persistent storage
-        access_token = get_user_token('demo_user', 'hubspot')
+        # Get HubSpot OAuth token for demo_user, refreshed if close to expiry
+        access_token = get_valid_hubspot_token('demo_user')
         
         if not access_token:
             raise HTTPException(
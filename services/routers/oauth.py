@@ -11,13 +11,15 @@ from core.token_store import (
     disconnect_service,
     is_service_connected
 )
+from core.hubspot_auth import (
+    HUBSPOT_CLIENT_ID,
+    HUBSPOT_CLIENT_SECRET,
+    HUBSPOT_TOKEN_URL,
+    expires_at_from
+)
 
 router = APIRouter()
 
-# OAuth Configuration
-HUBSPOT_CLIENT_ID = os.getenv('HUBSPOT_CLIENT_ID') or os.getenv('HUBSPOT_CLIENT_SECRET')  # Try both env names
-HUBSPOT_CLIENT_SECRET = os.getenv('HUBSPOT_CLIENT_SECRET')
-
 # Detect environment
 is_cloud_run = os.getenv('K_SERVICE') is not None
 
@@ -93,7 +95,7 @@ async def hubspot_callback(
     try:
         # Exchange code for token (HubSpot's actual endpoint)
         token_response = requests.post(
-            'https://api.hubapi.com/oauth/v1/token',
+            HUBSPOT_TOKEN_URL,
             data={
                 'grant_type': 'authorization_code',
                 'code': code,
@@ -116,7 +118,7 @@ async def hubspot_callback(
             service_name='hubspot',
             access_token=token_data.get('access_token'),
             refresh_token=token_data.get('refresh_token'),
-            expires_at=token_data.get('expires_in'),  # HubSpot uses expires_in (seconds)
+            expires_at=expires_at_from(token_data.get('expires_in')),  # HubSpot sends expires_in (seconds)
             additional_data={
                 'token_type': token_data.get('token_type'),
                 'hub_id': token_data.get('hub_id')
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from core.stripe_provider import get_stripe_provider
+from core.airtable_writeback import enqueue_sponsorship
 
 router = APIRouter()
 
@@ -191,6 +192,9 @@ async def confirm_payment(request: ConfirmPaymentRequest):
         # Generate receipt
         receipt = provider._generate_receipt(transaction_id)
         
+        # Record the sponsorship in Airtable (batched, in the background)
+        enqueue_sponsorship(receipt['sponsor_email'], receipt['tier'], receipt['amount'])
+        
         message = f"""Payment Successful! 🎉
 
 Receipt Details:
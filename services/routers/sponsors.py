@@ -1,19 +1,95 @@
-from fastapi import APIRouter
-from core.airtable import get_airtable_sponsors
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from core.airtable import iter_sponsors_from, stream_sponsors_json, sponsor_query
+from core.airtable_client import AirtableError
+from core.sponsor_mirror import find_sponsors
+from core.sponsor_search import get_sponsor_index, parse_number
 
 router = APIRouter()
 
+def _csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+def _parse_conditions(conditions: List[str], expected: str):
+    """'field:rest' strings -> [(field, rest)]"""
+    parsed = []
+    for condition in conditions:
+        field, sep, rest = condition.partition(':')
+        if not sep or not field.strip():
+            raise HTTPException(status_code=400, detail=f"Invalid filter {condition!r}, expected {expected}")
+        parsed.append((field.strip(), rest.strip()))
+    return parsed
+
+def _parse_bound(value: str, condition: str):
+    if not value:
+        return None
+    number = parse_number(value)
+    if number is None:
+        raise HTTPException(status_code=400, detail=f"Invalid range {condition!r}, bounds must be numbers")
+    return number
+
 @router.get("/list")
-async def list_sponsors(category: str = ""):
-    """Get list of sponsors from Airtable"""
+def list_sponsors(
+    category: str = "",
+    where: List[str] = Query(default=[], description="Extra field:value filters"),
+    fields: str = Query(default="", description="Comma-separated fields to return"),
+    sort: str = Query(default="", description="Comma-separated fields, -field for descending"),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    cursor: str = ""
+):
+    """Get list of sponsors from Airtable, streamed"""
+    
+    # Filters, projection and sort are all applied by Airtable
+    filters = {'category': category}
+    filters.update(_parse_conditions(where, "field:value"))
+    
+    try:
+        query = sponsor_query(filters, _csv(fields), _csv(sort))
+        items = iter_sponsors_from(find_sponsors(query), cursor or None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AirtableError as e:
+        print(f"❌ Airtable error: {e}")
+        raise HTTPException(status_code=503, detail=f"Sponsor database unavailable: {e}")
+    
+    return StreamingResponse(stream_sponsors_json(items, limit), media_type="application/json")
+
+@router.get("/search")
+def search_sponsors(
+    q: str = Query(default="", description="Words to match anywhere in the sponsor record"),
+    where: List[str] = Query(default=[], description="field:value filters; repeat a field to accept any of its values"),
+    ranges: List[str] = Query(default=[], alias="range", description="field:min..max numeric filters, either end optional"),
+    facets: str = Query(default="", description="Comma-separated fields to count values of"),
+    fields: str = Query(default="", description="Comma-separated fields to return"),
+    sort: str = Query(default="", description="Comma-separated fields, -field for descending (default: relevance)"),
+    limit: int = Query(default=10, ge=1, le=200)
+):
+    """Search sponsors from the in-memory index, with facet counts"""
+    
+    filters = {}
+    for field, value in _parse_conditions(where, "field:value"):
+        filters.setdefault(field, []).append(value)
     
-    sponsors = get_airtable_sponsors()
+    bounds_by_field = {}
+    for condition in ranges:
+        field, bounds = _parse_conditions([condition], "field:min..max")[0]
+        low, sep, high = bounds.partition('..')
+        if not sep:
+            raise HTTPException(status_code=400, detail=f"Invalid range {condition!r}, expected field:min..max")
+        bounds_by_field[field] = (_parse_bound(low, condition), _parse_bound(high, condition))
     
-    # Filter by category if provided
-    if category:
-        sponsors = [s for s in sponsors if s.get('category', '').lower() == category.lower()]
+    try:
+        index = get_sponsor_index()
+    except AirtableError as e:
+        print(f"❌ Airtable error: {e}")
+        raise HTTPException(status_code=503, detail=f"Sponsor database unavailable: {e}")
     
-    return {"sponsors": sponsors, "count": len(sponsors)}
+    result = index.search(q, filters, bounds_by_field, _csv(facets), _csv(sort), limit)
+    projection = _csv(fields)
+    if projection:
+        result['results'] = [{f: s[f] for f in projection if f in s} for s in result['results']]
+    return result
 
 @router.get("/opportunities")
 async def sponsor_opportunities(industry: str = "", budget: str = ""):
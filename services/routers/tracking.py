@@ -1,5 +1,23 @@
-from fastapi import APIRouter, Response
-from core.tracking import record_email_open
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
+import csv
+import io
+import json
+from core.link_tracking import verify_link
+from core.tracking_tokens import verify_tracking_id, rejections
+from core.open_filter import should_record, filter_stats
+from core.tracking import (
+    enqueue_email_open,
+    enqueue_email_click,
+    query_events,
+    get_tracking_stats,
+    get_campaign_stats,
+    list_campaigns,
+    list_tracking_records,
+    iter_tracking_records,
+    get_daily_stats,
+    get_timeseries
+)
 
 router = APIRouter()
 
@@ -9,14 +27,27 @@ TRACKING_PIXEL = bytes.fromhex(
     '0100010000020144003b'
 )
 
+def _client_ip(request: Request) -> str:
+    # Cloud Run puts the original client first in X-Forwarded-For
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else ""
+
 @router.get("/open/{tracking_id}")
-async def track_open(tracking_id: str):
+async def track_open(tracking_id: str, request: Request):
     """Tracking pixel endpoint - records email open"""
     
-    print(f"📬 Email opened! Tracking ID: {tracking_id}")
-    
-    # Record the open
-    record_email_open(tracking_id)
+    # Forged, expired or garbage IDs are dropped without touching storage,
+    # scanners and repeated proxy/prefetch fetches are dropped in memory
+    claims = verify_tracking_id(tracking_id)
+    if claims is not None and should_record(
+        tracking_id, _client_ip(request), request.headers.get("user-agent", "")
+    ):
+        print(f"📬 Email opened! Tracking ID: {tracking_id}")
+        
+        # Queue the open; the background writer persists it in batches
+        enqueue_email_open(tracking_id, claims['campaign_id'])
     
     # Return 1x1 transparent GIF
     return Response(
@@ -27,4 +58,152 @@ async def track_open(tracking_id: str):
             "Pragma": "no-cache",
             "Expires": "0"
         }
-    )
\ No newline at end of file
+    )
+
+@router.get("/click/{tracking_id}")
+async def track_click(tracking_id: str, request: Request, url: str, sig: str = ""):
+    """Click-through endpoint - records the click and redirects"""
+    
+    if not verify_link(url, sig):
+        raise HTTPException(status_code=400, detail="Invalid tracking link")
+    
+    # The link itself is signed, so still redirect for an invalid tracking ID
+    claims = verify_tracking_id(tracking_id)
+    if claims is not None and should_record(
+        tracking_id, _client_ip(request), request.headers.get("user-agent", ""), url
+    ):
+        # Queue the click; the background writer persists it in batches
+        enqueue_email_click(tracking_id, url, claims['campaign_id'])
+    
+    return RedirectResponse(url=url, status_code=302)
+
+@router.get("/events/{campaign_id}")
+def campaign_events(
+    campaign_id: str,
+    type: str = "",
+    since: str = "",
+    until: str = "",
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str = ""
+):
+    """Open/click events for a campaign, one page at a time, optionally within [since, until)"""
+    try:
+        events, next_cursor = query_events(
+            campaign_id, type or None, since or None, until or None, limit=limit, cursor=cursor or None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"campaign_id": campaign_id, "events": events, "count": len(events), "next_cursor": next_cursor}
+
+
+@router.get("/stats")
+def overall_stats():
+    """Overall counters across all campaigns"""
+    return {
+        **get_tracking_stats(),
+        "rejected_ids": dict(rejections),
+        "filtered_hits": dict(filter_stats)
+    }
+
+@router.get("/stats/{campaign_id}")
+def campaign_stats(campaign_id: str):
+    """Counters for one campaign"""
+    return {"campaign_id": campaign_id, **get_campaign_stats(campaign_id)}
+
+@router.get("/campaigns")
+def campaigns():
+    """Counters for every campaign"""
+    return {"campaigns": list_campaigns()}
+
+@router.get("/history/{campaign_id}")
+def campaign_history(campaign_id: str, since: str = "", until: str = ""):
+    """Daily counters by send day (YYYY-MM-DD in [since, until)), including rolled-up history"""
+    return {"campaign_id": campaign_id, "days": get_daily_stats(campaign_id, since or None, until or None)}
+
+@router.get("/timeseries/{campaign_id}")
+def campaign_timeseries(
+    campaign_id: str,
+    resolution: str = Query(default="hour", pattern="^(minute|hour|day)$"),
+    since: str = "",
+    until: str = ""
+):
+    """Pre-bucketed sends/opens/clicks for a campaign (ISO bucket bounds, [since, until))"""
+    buckets = get_timeseries(campaign_id, resolution, since or None, until or None)
+    return {"campaign_id": campaign_id, "resolution": resolution, "buckets": buckets}
+
+@router.get("/emails")
+def list_emails(
+    campaign_id: str = "",
+    recipient: str = "",
+    since: str = "",
+    until: str = "",
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: str = ""
+):
+    """Per-email tracking records, one page at a time (sent_at in [since, until))"""
+    try:
+        records, next_cursor = list_tracking_records(
+            campaign_id=campaign_id or None,
+            recipient=recipient or None,
+            sent_after=since or None,
+            sent_before=until or None,
+            limit=limit,
+            cursor=cursor or None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "emails": records,
+        "count": len(records),
+        "next_cursor": next_cursor
+    }
+
+EXPORT_COLUMNS = [
+    'tracking_id', 'recipient', 'campaign_id', 'sent_at',
+    'opened', 'opened_at', 'open_count', 'click_count'
+]
+
+def _ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record) + '\n'
+
+def _csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for record in records:
+        writer.writerow([record[col] for col in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no records
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get("/export")
+def export_emails(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    campaign_id: str = "",
+    since: str = "",
+    until: str = ""
+):
+    """Stream tracking records as NDJSON or CSV (sent_at in [since, until))"""
+    records = iter_tracking_records(
+        campaign_id=campaign_id or None,
+        sent_after=since or None,
+        sent_before=until or None
+    )
+
+    if format == "csv":
+        return StreamingResponse(
+            _csv_lines(records),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=tracking_export.csv"}
+        )
+    return StreamingResponse(
+        _ndjson_lines(records),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=tracking_export.ndjson"}
+    )
@@ -0,0 +1,92 @@
+"""
+Stress test: token writers in several threads and processes must not lose
+each other's updates, and readers must never see partial state. Runs
+against the file and SQLite backends.
+"""
+
+import multiprocessing
+import threading
+
+import pytest
+
+WORKERS = 4
+WRITES_PER_WORKER = 40
+
+
+def _use_store(backend, path):
+    import core.token_store as token_store
+    if backend == 'file':
+        token_store.TOKEN_FILE = path
+        token_store._backend = token_store.FileTokenBackend()
+    else:
+        token_store._backend = token_store.SQLiteTokenBackend(path)
+    return token_store
+
+
+def _hammer(token_store, worker):
+    misses = 0
+    for n in range(WRITES_PER_WORKER):
+        token_store.store_user_token(f"user{worker}", f"service{n}", f"token-{worker}-{n}")
+        # Seeded before any worker started - must stay visible throughout
+        if token_store.get_user_token('seed', 'hubspot') != 'seed-token':
+            misses += 1
+    return misses
+
+
+def _hammer_in_process(args):
+    store, worker = args
+    return _hammer(_use_store(*store), worker)
+
+
+@pytest.fixture(params=['file', 'sqlite'])
+def store(request, tmp_path):
+    import core.token_store as token_store
+    original = token_store.TOKEN_FILE, token_store._backend
+    backend = request.param
+    path = str(tmp_path / ('user_tokens.json' if backend == 'file' else 'user_tokens.db'))
+    _use_store(backend, path)
+    token_store.store_user_token('seed', 'hubspot', 'seed-token')
+    yield backend, path
+    token_store.TOKEN_FILE, token_store._backend = original
+
+
+def _assert_all_written(token_store, workers):
+    for worker in range(workers):
+        for n in range(WRITES_PER_WORKER):
+            assert token_store.get_user_token(f"user{worker}", f"service{n}") == f"token-{worker}-{n}"
+
+
+def test_concurrent_token_writes_from_threads(store):
+    token_store = _use_store(*store)
+    misses = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            if not token_store.get_all_connections('seed')['hubspot']:
+                misses.append(1)
+
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    writers = [
+        threading.Thread(target=lambda w=w: misses.extend([1] * _hammer(token_store, w)))
+        for w in range(WORKERS)
+    ]
+    for t in writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    reader_thread.join()
+
+    assert not misses
+    _assert_all_written(token_store, WORKERS)
+
+
+def test_concurrent_token_writes_from_processes(store):
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(WORKERS) as pool:
+        misses = sum(pool.map(_hammer_in_process, [(store, w) for w in range(WORKERS)]))
+
+    assert misses == 0
+    _assert_all_written(_use_store(*store), WORKERS)
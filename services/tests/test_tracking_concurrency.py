@@ -0,0 +1,67 @@
+"""
+Stress test: several worker processes recording opens against the same
+tracking database must not lose or double-count any event.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+
+WORKERS = 4
+OPENS_PER_WORKER = 250
+EMAILS = 20
+
+
+def _init_worker(db_path, workdir):
+    # Must happen before core.tracking is imported in the child
+    os.environ['TRACKING_DB'] = db_path
+    os.environ['TRACKING_FLUSH_BATCH'] = '25'
+    os.chdir(workdir)
+
+
+def _mint(count):
+    from core.tracking import create_tracking_id
+    return [create_tracking_id(f"sponsor{i}@example.com", "stress") for i in range(count)]
+
+
+def _fire_opens(args):
+    worker, tracking_ids = args
+    from core.tracking import enqueue_email_open, record_email_open, stop_event_writer
+
+    for n in range(OPENS_PER_WORKER):
+        tracking_id = tracking_ids[(worker + n) % len(tracking_ids)]
+        # Mix the write-behind path used by the pixel with direct writes
+        if n % 2:
+            enqueue_email_open(tracking_id, "stress")
+        else:
+            record_email_open(tracking_id)
+
+    stop_event_writer()
+    return OPENS_PER_WORKER
+
+
+def test_concurrent_opens_from_multiple_processes(tmp_path):
+    db_path = str(tmp_path / 'tracking.db')
+    ctx = multiprocessing.get_context('spawn')
+
+    with ctx.Pool(WORKERS, initializer=_init_worker, initargs=(db_path, str(tmp_path))) as pool:
+        tracking_ids = pool.apply(_mint, (EMAILS,))
+        fired = sum(pool.map(_fire_opens, [(w, tracking_ids) for w in range(WORKERS)]))
+
+    assert fired == WORKERS * OPENS_PER_WORKER
+
+    conn = sqlite3.connect(db_path)
+    events = conn.execute("SELECT COUNT(*) FROM events WHERE type = 'open'").fetchone()[0]
+    open_counts = conn.execute('SELECT SUM(open_count), SUM(opened) FROM emails').fetchone()
+    campaign = conn.execute(
+        "SELECT total_emails, opened_emails, open_events FROM campaign_stats WHERE campaign_id = 'stress'"
+    ).fetchone()
+    overall = conn.execute(
+        "SELECT total_emails, opened_emails, open_events FROM campaign_stats WHERE campaign_id = '*'"
+    ).fetchone()
+    conn.close()
+
+    assert events == fired
+    assert open_counts == (fired, EMAILS)
+    assert campaign == (EMAILS, EMAILS, fired)
+    assert overall == campaign